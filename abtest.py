@@ -0,0 +1,123 @@
+"""
+A/B matches between two bots, stopped as soon as the result is significant.
+
+Every deal is played duplicate: bot A holds seats 0 and 2 and bot B seats 1
+and 3, then the seats are rotated by one so each bot plays the other's
+cards. A's mean score minus B's over both games is one sample. After every
+deal two sequential probability ratio tests (SPRT) weigh "A is better by
+`delta`" and "B is better by `delta`" against "they are even"; the match
+stops once one bot is found better, or both tests accept they are even, or
+after `max_deals`.
+
+    python abtest.py [--a JSON] [--b JSON] [--delta D] [--max-deals N]
+
+where A and B are bots.HeuristicBot parameters, the defaults when omitted.
+"""
+from __future__ import division
+import argparse
+from collections import namedtuple
+import json
+import math
+
+from bots import HeuristicBot
+from probab import Z_SCORES
+import simulate
+
+Result = namedtuple('Result', ('winner', 'deals', 'games', 'effect', 'low', 'high',
+                               'effect_size', 'p_value'))
+
+SEATS = 4
+
+
+def play_duplicate(make_a, make_b, seed):
+    """A's mean score minus B's on deal `seed`, played in both seatings"""
+    difference = 0.0
+    for rotation in xrange(2):
+        players = []
+        for seat in xrange(SEATS):
+            is_a = (seat + rotation) % 2 == 0
+            players.append((make_a if is_a else make_b)('%s%d' % ('AB'[not is_a], seat + 1)))
+        scores = simulate.play_game(seed, players)['scores']
+        for seat, score in enumerate(scores):
+            difference += score if (seat + rotation) % 2 == 0 else -score
+    return difference / SEATS
+
+
+def ab_test(make_a, make_b, delta=0.1, alpha=0.05, beta=0.05, max_deals=100000,
+            min_deals=20, first_seed=0, confidence=0.95, progress=None):
+    """
+    Plays deals first_seed, first_seed + 1, ... until the tests decide.
+    `make_a` and `make_b` make a player of a given name. The winner is 'A',
+    'B', '=' for even bots or None when `max_deals` were played without a
+    decision; the effect is A's mean score advantage per seat and deal, with
+    its interval.
+    """
+    upper = math.log((1 - beta) / alpha)
+    lower = math.log(beta / (1 - alpha))
+    total = total_squares = 0.0
+    winner = None
+    deals = 0
+    while deals < max_deals:
+        x = play_duplicate(make_a, make_b, first_seed + deals)
+        deals += 1
+        total += x
+        total_squares += x * x
+        if deals < min_deals:
+            continue
+        variance = max((total_squares - total * total / deals) / (deals - 1), 1e-12)
+        # log likelihood ratios of N(delta, variance) and N(-delta, variance)
+        # against N(0, variance)
+        even = deals * delta * delta / 2
+        llr_a = (delta * total - even) / variance
+        llr_b = (-delta * total - even) / variance
+        if progress:
+            progress(deals, llr_a, llr_b)
+        if llr_a >= upper:
+            winner = 'A'
+            break
+        if llr_b >= upper:
+            winner = 'B'
+            break
+        if llr_a <= lower and llr_b <= lower:
+            winner = '='
+            break
+
+    mean = total / deals
+    variance = (total_squares - total * total / deals) / (deals - 1) if deals > 1 else 0.0
+    # below the rounding noise of the sums the samples are all equal
+    deviation = math.sqrt(variance) if variance > 1e-12 else 0.0
+    error = deviation / math.sqrt(deals)
+    half = Z_SCORES[confidence] * error
+    if deviation:
+        effect_size = mean / deviation
+        p_value = math.erfc(abs(mean) / error / math.sqrt(2))
+    else:
+        effect_size = 0.0
+        p_value = 1.0 if abs(mean) < 1e-9 else 0.0
+    return Result(winner, deals, 2 * deals, mean, mean - half, mean + half, effect_size, p_value)
+
+
+def heuristic_bot(parameters):
+    return lambda name: HeuristicBot(name, parameters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--a', type=json.loads, default={}, help='parameters of bot A, as JSON')
+    parser.add_argument('--b', type=json.loads, default={'lead_high': 1},
+                        help='parameters of bot B, as JSON')
+    parser.add_argument('--delta', type=float, default=0.1, help='score difference to detect')
+    parser.add_argument('--max-deals', type=int, default=100000, help='deals played at most')
+    args = parser.parse_args()
+
+    result = ab_test(heuristic_bot(args.a), heuristic_bot(args.b), args.delta, max_deals=args.max_deals)
+    print 'winner       %s' % {'A': 'A', 'B': 'B', '=': 'none, even bots', None: 'no decision'}[result.winner]
+    print 'deals        %d (%d games)' % (result.deals, result.games)
+    print 'effect       %+.3f per seat and deal, 95%% interval %+.3f .. %+.3f' % (
+        result.effect, result.low, result.high)
+    print 'effect size  %+.3f' % result.effect_size
+    print 'p value      %.4f' % result.p_value
+
+
+if __name__ == '__main__':
+    main()
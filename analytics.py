@@ -0,0 +1,162 @@
+"""
+Columnar store of per seat facts of recorded games, for strategy analysis.
+
+Every (game, seat) of the records is a row, columns are NumPy arrays:
+
+    game        game id (position in the records, or the archive id)
+    seat        seat number
+    spades      spade length of the dealt hand
+    high_cards  aces, kings and queens of the dealt hand
+    call        call of the seat
+    won         tricks won
+    score       score of the round
+    made        whether the call was made
+    bot         code of the bot type, a position in `bot_names`
+
+Queries are vectorized, e.g. hands called 5 or more and failed, by spade
+length:
+
+    failed = facts.where((facts['call'] >= 5) & ~facts['made'])
+    lengths, counts = failed.group_by('spades', 'won', 'count')
+"""
+import sys
+import time
+
+import numpy as np
+
+COLUMNS = [
+    ('game', 'int64'),
+    ('seat', 'int8'),
+    ('spades', 'int8'),
+    ('high_cards', 'int8'),
+    ('call', 'int8'),
+    ('won', 'int8'),
+    ('score', 'float32'),
+    ('made', 'bool'),
+    ('bot', 'int16'),
+]
+
+DEFAULT_BOT = 'Player'
+
+
+class GameFacts:
+    def __init__(self, columns, bot_names):
+        self.columns = columns
+        self.bot_names = list(bot_names)
+
+    @classmethod
+    def from_records(cls, records, first_game=0):
+        """rows of simulate.play_game records, games numbered from `first_game`"""
+        return cls.from_pairs(enumerate(records, first_game))
+
+    @classmethod
+    def from_archive(cls, archive):
+        return cls.from_pairs(archive)
+
+    @classmethod
+    def from_pairs(cls, games):
+        """rows of (game id, record) pairs"""
+        rows = dict((name, []) for name, dtype in COLUMNS)
+        bot_names = []
+        bot_codes = {}
+        for game_id, record in games:
+            bots = record.get('bots') or [DEFAULT_BOT] * len(record['hands'])
+            for seat, hand in enumerate(record['hands']):
+                bot = bots[seat]
+                if bot not in bot_codes:
+                    bot_codes[bot] = len(bot_names)
+                    bot_names.append(bot)
+                call, won = record['calls'][seat], record['won'][seat]
+                rows['game'].append(game_id)
+                rows['seat'].append(seat)
+                rows['spades'].append(sum(1 for card_id in hand if card_id < 13))
+                rows['high_cards'].append(sum(1 for card_id in hand if card_id % 13 >= 10))
+                rows['call'].append(call)
+                rows['won'].append(won)
+                rows['score'].append(record['scores'][seat])
+                rows['made'].append(won >= call)
+                rows['bot'].append(bot_codes[bot])
+        columns = dict((name, np.array(rows[name], dtype=dtype)) for name, dtype in COLUMNS)
+        return cls(columns, bot_names)
+
+    @classmethod
+    def concatenate(cls, parts):
+        """one store of several, bot codes being renumbered"""
+        bot_names = []
+        columns = dict((name, []) for name, dtype in COLUMNS)
+        for part in parts:
+            codes = []
+            for name in part.bot_names:
+                if name not in bot_names:
+                    bot_names.append(name)
+                codes.append(bot_names.index(name))
+            for name, dtype in COLUMNS:
+                column = part.columns[name]
+                if name == 'bot':
+                    column = np.array(codes, dtype=dtype)[column]
+                columns[name].append(column)
+        return cls(dict((name, np.concatenate(columns[name]).astype(dtype))
+                        for name, dtype in COLUMNS), bot_names)
+
+    def __len__(self):
+        return len(self.columns['game'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def bot_code(self, name):
+        return self.bot_names.index(name)
+
+    def where(self, mask):
+        """rows selected by a boolean array, e.g. facts['call'] >= 5"""
+        return GameFacts(dict((name, column[mask]) for name, column in self.columns.iteritems()),
+                         self.bot_names)
+
+    def group_by(self, key, value=None, agg='count'):
+        """
+        Distinct values of column `key` and, for each, the `agg` (count, sum,
+        mean, min or max) of column `value`
+        """
+        keys, inverse = np.unique(self.columns[key], return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(keys))
+        if agg == 'count':
+            return keys, counts
+        values = self.columns[value]
+        if agg in ('sum', 'mean'):
+            sums = np.bincount(inverse, weights=values, minlength=len(keys))
+            return keys, sums if agg == 'sum' else sums / counts
+        if agg in ('min', 'max'):
+            order = np.argsort(inverse, kind='mergesort')
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            ufunc = np.minimum if agg == 'min' else np.maximum
+            return keys, ufunc.reduceat(values[order], starts)
+        raise ValueError('Unknown aggregation %r.' % agg)
+
+    def save(self, path):
+        arrays = dict(self.columns)
+        arrays['bot_names'] = np.array(self.bot_names)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            columns = dict((name, data[name]) for name, dtype in COLUMNS)
+            return cls(columns, [str(name) for name in data['bot_names']])
+
+
+if __name__ == '__main__':
+    import simulate
+
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    facts = GameFacts.from_records(simulate.play_game(seed) for seed in xrange(games))
+    # repeat the rows to time the scans over millions of them
+    facts = GameFacts.concatenate([facts] * max(1, 2000000 // len(facts)))
+
+    start = time.time()
+    failed = facts.where((facts['call'] >= 5) & ~facts['made'])
+    lengths, counts = failed.group_by('spades')
+    lengths, scores = facts.group_by('spades', 'score', 'mean')
+    elapsed = time.time() - start
+    print '%d rows, queried in %.1f ms' % (len(facts), elapsed * 1000)
+    for length, score in zip(lengths, scores):
+        print 'spades %2d: mean score %.2f' % (length, score)
@@ -0,0 +1,197 @@
+"""
+Random access archive of game records (see simulate.py).
+
+Records are written as JSON lines into zlib compressed blocks, followed by
+fixed width tables and a footer:
+
+    header   MAGIC
+    blocks   compressed blocks of JSON lines
+    blocks   (file offset, compressed size) of every block
+    games    (game id, block, offset, size) sorted by game id
+    tables   (table id, game id) sorted
+    footer   offsets and counts of the three tables, MAGIC
+
+The reader memory-maps the file, binary searches the tables in place and
+decompresses only the blocks it needs, keeping the last ones in an LRU.
+"""
+import json
+import mmap
+import struct
+import zlib
+
+import numpy as np
+
+import cache
+
+MAGIC = 'CBARCH1\0'
+BLOCK = struct.Struct('<QI')
+GAME = struct.Struct('<QIII')
+TABLE = struct.Struct('<QQ')
+FOOTER = struct.Struct('<QQQQQQ8s')
+# the same rows as numpy records, for sorting the index at close
+GAME_DTYPE = np.dtype([('id', '<u8'), ('block', '<u4'), ('offset', '<u4'), ('size', '<u4')])
+TABLE_DTYPE = np.dtype([('table', '<u8'), ('game', '<u8')])
+
+
+class ArchiveWriter:
+    def __init__(self, path, block_size=1 << 16, level=6):
+        self.f = open(path, 'wb')
+        self.f.write(MAGIC)
+        self.block_size = block_size
+        self.level = level
+        self.pending = []
+        self.pending_size = 0
+        self.blocks = []
+        self.games = bytearray()  # packed GAME rows in insertion order
+        self.tables = bytearray()  # packed TABLE rows
+
+    def add(self, game_id, record, table_id=None):
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        self.games += GAME.pack(game_id, len(self.blocks), self.pending_size, len(line))
+        if table_id is not None:
+            self.tables += TABLE.pack(table_id, game_id)
+        self.pending.append(line)
+        self.pending_size += len(line)
+        if self.pending_size >= self.block_size:
+            self.flush_block()
+
+    def flush_block(self):
+        if not self.pending:
+            return
+        data = zlib.compress(''.join(self.pending), self.level)
+        self.blocks.append((self.f.tell(), len(data)))
+        self.f.write(data)
+        self.pending = []
+        self.pending_size = 0
+
+    def close(self):
+        self.flush_block()
+        games = np.frombuffer(self.games, GAME_DTYPE)
+        games = games[np.argsort(games['id'], kind='mergesort')]
+        twice = np.flatnonzero(games['id'][1:] == games['id'][:-1])
+        if len(twice):
+            raise ValueError('Game %d is archived twice.' % games['id'][twice[0]])
+        tables = np.frombuffer(self.tables, TABLE_DTYPE)
+        tables = tables[np.lexsort((tables['game'], tables['table']))]
+
+        offsets = []
+        for data in (''.join([BLOCK.pack(*block) for block in self.blocks]),
+                     games.tobytes(), tables.tobytes()):
+            offsets.append(self.f.tell())
+            self.f.write(data)
+        self.f.write(FOOTER.pack(offsets[0], len(self.blocks), offsets[1], len(games),
+                                 offsets[2], len(tables), MAGIC))
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Archive:
+    def __init__(self, path, cached_blocks=64):
+        self.f = open(path, 'rb')
+        self.data = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        footer = FOOTER.unpack_from(self.data, len(self.data) - FOOTER.size)
+        if self.data[:len(MAGIC)] != MAGIC or footer[-1] != MAGIC:
+            raise ValueError('%s is not a game archive.' % path)
+        (self.blocks_at, self.block_count, self.games_at, self.game_count,
+         self.tables_at, self.table_count) = footer[:-1]
+        self.blocks = cache.LRUCache(cached_blocks)
+
+    def __len__(self):
+        return self.game_count
+
+    def __contains__(self, game_id):
+        return self._find_game(game_id) is not None
+
+    def _bisect(self, at, count, layout, key):
+        # first row whose leading field is >= key
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if struct.unpack_from('<Q', self.data, at + middle * layout.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _find_game(self, game_id):
+        row = self._bisect(self.games_at, self.game_count, GAME, game_id)
+        if row < self.game_count:
+            entry = GAME.unpack_from(self.data, self.games_at + row * GAME.size)
+            if entry[0] == game_id:
+                return entry
+        return None
+
+    def _block(self, block):
+        data = self.blocks.get(block)
+        if data is None:
+            offset, size = BLOCK.unpack_from(self.data, self.blocks_at + block * BLOCK.size)
+            data = self.blocks[block] = zlib.decompress(self.data[offset:offset + size])
+        return data
+
+    def get(self, game_id):
+        entry = self._find_game(game_id)
+        if entry is None:
+            raise KeyError(game_id)
+        game_id, block, offset, size = entry
+        return json.loads(self._block(block)[offset:offset + size])
+
+    __getitem__ = get
+
+    def table_games(self, table_id):
+        """ids of the games of a table, in order"""
+        row = self._bisect(self.tables_at, self.table_count, TABLE, table_id)
+        games = []
+        while row < self.table_count:
+            table, game_id = TABLE.unpack_from(self.data, self.tables_at + row * TABLE.size)
+            if table != table_id:
+                break
+            games.append(game_id)
+            row += 1
+        return games
+
+    def table(self, table_id):
+        return [self.get(game_id) for game_id in self.table_games(table_id)]
+
+    def __iter__(self):
+        """(game id, record) in game id order"""
+        for row in xrange(self.game_count):
+            game_id, block, offset, size = GAME.unpack_from(self.data, self.games_at + row * GAME.size)
+            yield game_id, json.loads(self._block(block)[offset:offset + size])
+
+    def close(self):
+        self.data.close()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == '__main__':
+    import random
+    import sys
+    import time
+
+    import simulate
+
+    path = sys.argv[1] if len(sys.argv) > 1 else 'games.cba'
+    games = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    records = [json.loads(json.dumps(simulate.play_game(seed))) for seed in xrange(100)]
+    with ArchiveWriter(path) as writer:
+        for game_id in xrange(games):
+            writer.add(game_id, records[game_id % len(records)], table_id=game_id // 50)
+
+    with Archive(path) as archive:
+        ids = [random.randrange(games) for i in xrange(10000)]
+        start = time.time()
+        for game_id in ids:
+            assert archive[game_id] == records[game_id % len(records)]
+        print '%d games, lookup %.1f us' % (len(archive), (time.time() - start) / len(ids) * 1e6)
+        print 'table 3: games %s' % archive.table_games(3)[:5], '...'
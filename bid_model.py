@@ -0,0 +1,99 @@
+"""
+Learned call predictor, the batched counterpart of call.can_win.
+
+Hands are 52-slot rows (see Card.id) and a model is a stack of dense layers
+with ReLU in between, stored as NumPy arrays in an .npz file. A single
+`predict` call scores a whole batch of hands with a few matrix products.
+"""
+import sys
+import time
+
+import numpy as np
+
+from callbreak_card import hand_ids
+import dataset
+
+MIN_CALL = 1
+MAX_CALL = 13
+
+
+def encode_hands(hands):
+    """(hands, 52) float32 rows from lists of card ids or Player.cards"""
+    hands = list(hands)
+    encoded = np.zeros((len(hands), 52), dtype=np.float32)
+    for row, hand in enumerate(hands):
+        encoded[row, hand_ids(hand)] = 1
+    return encoded
+
+
+class BidModel:
+    def __init__(self, layers):
+        # [(weights, bias), ...], weights shaped (inputs, outputs)
+        self.layers = [(np.asarray(w, dtype=np.float32), np.asarray(b, dtype=np.float32))
+                       for w, b in layers]
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            count = len(data.files) // 2
+            return cls([(data['w%d' % i], data['b%d' % i]) for i in xrange(count)])
+
+    def save(self, path):
+        arrays = {}
+        for i, (w, b) in enumerate(self.layers):
+            arrays['w%d' % i] = w
+            arrays['b%d' % i] = b
+        np.savez(path, **arrays)
+
+    def predict(self, hands):
+        """Expected tricks for each row of a (hands, 52) array"""
+        x = np.asarray(hands, dtype=np.float32)
+        last = len(self.layers) - 1
+        for i, (w, b) in enumerate(self.layers):
+            x = np.dot(x, w)
+            x += b
+            if i != last:
+                np.maximum(x, 0, out=x)
+        return x[:, 0]
+
+    def suggest_calls(self, hands):
+        tricks = self.predict(hands)
+        return np.clip(np.floor(tricks), MIN_CALL, MAX_CALL).astype(np.int8)
+
+
+def fit_linear(directory, l2=1.0):
+    """
+    Ridge regression of tricks won on the hand, accumulated shard by shard
+    from a dataset.export directory
+    """
+    xtx = np.zeros((53, 53))
+    xty = np.zeros(53)
+    for shard in dataset.iter_shards(directory):
+        x = shard['hands'].reshape(-1, 52).astype(np.float64)
+        x = np.hstack([x, np.ones((len(x), 1))])
+        y = shard['won'].reshape(-1).astype(np.float64)
+        xtx += np.dot(x.T, x)
+        xty += np.dot(x.T, y)
+
+    penalty = l2 * np.eye(53)
+    penalty[52, 52] = 0  # the bias is not penalized
+    solution = np.linalg.solve(xtx + penalty, xty)
+    return BidModel([(solution[:52, None], solution[52:])])
+
+
+def benchmark(model, count=10000):
+    hands = np.zeros((count, 52), dtype=np.float32)
+    for row in hands:
+        row[np.random.permutation(52)[:13]] = 1
+    start = time.time()
+    model.suggest_calls(hands)
+    return count / (time.time() - start)
+
+
+if __name__ == '__main__':
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'dataset'
+    path = sys.argv[2] if len(sys.argv) > 2 else 'bid_model.npz'
+    model = fit_linear(directory)
+    model.save(path)
+    print 'saved', path
+    print '%d hands/s' % benchmark(model)
@@ -0,0 +1,44 @@
+"""
+Bots whose decisions are driven by parameters, for tuning (see tuning.py).
+"""
+from callbreak_card import Player
+import call
+
+# defaults reproduce the calls of simulate.make_calls and Player.think_to_play
+PARAMETERS = {
+    'rank_offset': call.RANK_OFFSET,  # see call.win_chance_for_card
+    'call_shift': 0,  # added to the call maximizing the expected score
+    'cheap_win_seats': 1,  # last seats of a trick winning with their lowest winner
+    'lead_high': 0,  # lead the highest card rather than the lowest
+}
+
+# inclusive bounds searched by the tuner
+SPACE = {
+    'rank_offset': (12, 17),
+    'call_shift': (-2, 2),
+    'cheap_win_seats': (0, 3),
+    'lead_high': (0, 1),
+}
+
+
+class HeuristicBot(Player):
+    def __init__(self, name, parameters=None):
+        Player.__init__(self, name, is_bot=True)
+        self.parameters = dict(PARAMETERS)
+        self.parameters.update(parameters or {})
+
+    def make_call(self, game):
+        p = self.parameters
+        suggestion = call.optimize_call(self.cards, suit_size=13 * game.deck.no_of_decks,
+                                        other_players_count=len(game.players) - 1,
+                                        hand_size=game.hand_size, rank_offset=p['rank_offset'])
+        self.call = min(max(suggestion.call + p['call_shift'], call.MIN_CALL), game.hand_size)
+
+    def think_to_play(self, turn, legal_cards, has_greater_card):
+        p = self.parameters
+        if not turn.cards:
+            return max(legal_cards) if p['lead_high'] else min(legal_cards)
+        if has_greater_card and len(turn.cards) < len(turn.players) - p['cheap_win_seats']:
+            return max(legal_cards)
+        else:
+            return min(legal_cards)
@@ -0,0 +1,101 @@
+"""
+Bounded memoization, least recently used entries are evicted first.
+"""
+from collections import OrderedDict
+import functools
+import shelve
+
+
+class LRUCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        try:
+            value = self.data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self.data.pop(key, None)
+        if len(self.data) >= self.maxsize:
+            self.data.popitem(last=False)
+        self.data[key] = value
+
+    def clear(self):
+        self.data.clear()
+        self.hits = self.misses = 0
+
+
+_missing = object()
+
+
+class PersistentCache(LRUCache):
+    """
+    LRUCache in front of a shelve file, so entries survive restarts and can
+    be shared by runs. Keys are stored by their repr and the file is synced
+    every `sync_every` writes. Only one process may write it at a time.
+    """
+    def __init__(self, path, maxsize=1024, sync_every=1000):
+        LRUCache.__init__(self, maxsize)
+        self.shelf = shelve.open(path)
+        self.sync_every = sync_every
+        self.unsynced = 0
+
+    def get(self, key, default=None):
+        value = LRUCache.get(self, key, _missing)
+        if value is _missing:
+            try:
+                value = self.shelf[repr(key)]
+            except KeyError:
+                return default
+            self.misses -= 1
+            self.hits += 1
+            LRUCache.__setitem__(self, key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        LRUCache.__setitem__(self, key, value)
+        self.shelf[repr(key)] = value
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        self.shelf.sync()
+        self.unsynced = 0
+
+    def close(self):
+        self.shelf.close()
+
+
+def lru_cache(maxsize=1024):
+    """
+    Memoizes a function of hashable positional arguments, the cache being
+    available as its `cache` attribute
+    """
+    def decorator(function):
+        cache = LRUCache(maxsize)
+
+        @functools.wraps(function)
+        def wrapper(*args):
+            value = cache.get(args, _missing)
+            if value is _missing:
+                value = cache[args] = function(*args)
+            return value
+        wrapper.cache = cache
+        return wrapper
+    return decorator
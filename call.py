@@ -1,40 +1,235 @@
+from __future__ import division
+from collections import namedtuple
+import itertools
+import json
+import multiprocessing
 import os
 import pickle
+import sys
 
-from callbreak_card import Player, CallBreak
+from callbreak_card import Player, CallBreak, get_score, hand_from_ids, hand_ids
+import cache
 import probab
 
-def win_chance_for_card(card, cards_count, other_players_count=3):
-    same_suit_remaining_cards = 13 - cards_count
-    min_cards_to_exist = 15 - card.face.value
+CallSuggestion = namedtuple('CallSuggestion', ('call', 'expected_score', 'distribution'))
+
+MIN_CALL = 1
+RANK_OFFSET = 15  # a card of face value v wins the round of its suit when RANK_OFFSET - v are held
+WIN_CHANCE_WIDTH = 0.05  # confidence interval sampled down to, easy cards stop after a batch or two
+WIN_CHANCE_SAMPLES = 2000
+
+_evaluations = cache.LRUCache(maxsize=100000)
+
+def win_chance_for_card(card, cards_count, other_players_count=3, suit_size=13, rank_offset=RANK_OFFSET):
+    same_suit_remaining_cards = suit_size - cards_count
+    min_cards_to_exist = rank_offset - card.face.value
 
     if cards_count < min_cards_to_exist:
         return 0
 
     generator = lambda: probab.get_heart_distribution(same_suit_remaining_cards, other_players_count)
     predicate = lambda dist: probab.contains_min(dist, min_cards_to_exist)
-    return probab.get_prob(generator, predicate, repeat=1000, count=2)
+    return probab.estimate_prob(generator, predicate, width=WIN_CHANCE_WIDTH,
+                                max_samples=WIN_CHANCE_SAMPLES).value
 
 
-def can_win(cards):
+def can_win(cards, other_players_count=3, suit_size=13, verbose=True, rank_offset=RANK_OFFSET):
     """
     Probability that each card can lead on same suit
     """
     chance = 0
     for suit_cards in cards:
         for card in suit_cards:
-            p = win_chance_for_card(card, len(suit_cards), other_players_count=3)
-            print card, '=', p
+            p = win_chance_for_card(card, len(suit_cards), other_players_count, suit_size, rank_offset)
+            if verbose:
+                print card, '=', p
             chance += p
     return chance
 
 
-def suggest_call(cards):
-    chance = can_win(cards)
+def canonical_hand(cards):
+    """
+    Key shared by the hands which only differ by a permutation of hearts,
+    clubs and diamonds: the spade faces, then the side suits' faces in order
+    """
+    suits = [tuple(sorted((card.face.value for card in suit_cards), reverse=True)) for suit_cards in cards]
+    return (suits[0],) + tuple(sorted(suits[1:]))
+
+
+def use_evaluation_cache(path=None, maxsize=100000):
+    """
+    Replaces the cache of hand evaluations, keeping them in memory only or,
+    given `path`, in a shelve file too
+    """
+    global _evaluations
+    if isinstance(_evaluations, cache.PersistentCache):
+        _evaluations.close()
+    if path:
+        _evaluations = cache.PersistentCache(path, maxsize)
+    else:
+        _evaluations = cache.LRUCache(maxsize)
+    return _evaluations
+
+
+def suggest_call(cards, verbose=True):
+    key = _suggest_key(cards)
+    chance = _evaluations.get(key)
+    if chance is None:
+        chance = _evaluations[key] = can_win(cards, verbose=verbose)
     return chance
 
 
-if __name__ == '__main__':
+_suit_distributions = {}
+
+def suit_trick_distribution(faces, suit_size=13, other_players_count=3, hand_size=13,
+                            rank_offset=RANK_OFFSET):
+    """
+    Exact distribution of tricks taken by a suit holding (face values), using
+    the same rule as win_chance_for_card: a card needing `m` rounds wins when
+    every other player still holds `m` cards of the suit
+    """
+    cards_count = len(faces)
+    needs = tuple(sorted(max(0, rank_offset - face) for face in faces if rank_offset - face <= cards_count))
+    key = needs, cards_count, suit_size, other_players_count, hand_size
+    if key in _suit_distributions:
+        return _suit_distributions[key]
+
+    remaining = suit_size - cards_count
+    # cards not dealt to anyone, e.g. on a 3 player table or with a short hand size
+    undealt = 4 * suit_size - (other_players_count + 1) * hand_size
+    at_least = probab.get_min_count_probabilities(remaining, other_players_count, hand_size, undealt)
+    at_least = at_least + [0.0] * (max(needs or [0]) + 1 - len(at_least))
+    # k tricks when the shortest hand holds at least needs[k-1] but not needs[k]
+    bounds = [1.0] + [at_least[need] for need in needs] + [0.0]
+    distribution = [bounds[k] - bounds[k + 1] for k in xrange(len(needs) + 1)]
+
+    _suit_distributions[key] = distribution
+    return distribution
+
+
+def trick_distribution(cards, suit_size=13, other_players_count=3, hand_size=13,
+                       rank_offset=RANK_OFFSET):
+    """
+    Distribution of tricks for a whole hand, convolving the per suit
+    distributions as if the suits were independent
+    """
+    distribution = [1.0]
+    for suit_cards in cards:
+        faces = [card.face.value for card in suit_cards]
+        suit = suit_trick_distribution(faces, suit_size, other_players_count, hand_size, rank_offset)
+        combined = [0.0] * (len(distribution) + len(suit) - 1)
+        for i, p in enumerate(distribution):
+            if p:
+                for j, q in enumerate(suit):
+                    combined[i + j] += p * q
+        distribution = combined
+    return distribution
+
+
+def expected_score(distribution, call):
+    return sum(p * get_score(call, won) for won, p in enumerate(distribution))
+
+
+def _suggest_key(cards):
+    return 'suggest_call', canonical_hand(cards)
+
+
+def _optimize_key(cards, max_call=None, suit_size=13, other_players_count=3, hand_size=13,
+                  rank_offset=RANK_OFFSET):
+    return ('optimize_call', canonical_hand(cards), max_call, suit_size, other_players_count, hand_size,
+            rank_offset)
+
+
+def optimize_call(cards, max_call=None, suit_size=13, other_players_count=3, hand_size=13,
+                  rank_offset=RANK_OFFSET):
+    """
+    Call which maximizes the expected score, instead of the mean number of
+    tricks returned by suggest_call. `suit_size` is 13 per deck and
+    `hand_size` the cards dealt to each player.
+    """
+    key = _optimize_key(cards, max_call, suit_size, other_players_count, hand_size, rank_offset)
+    suggestion = _evaluations.get(key)
+    if suggestion is not None:
+        return suggestion
+
+    distribution = trick_distribution(cards, suit_size, other_players_count, hand_size, rank_offset)
+    best = None
+    for call in xrange(MIN_CALL, (max_call or hand_size) + 1):
+        score = expected_score(distribution, call)
+        if best is None or score > best[1]:
+            best = call, score
+    suggestion = _evaluations[key] = CallSuggestion(best[0], best[1], tuple(distribution))
+    return suggestion
+
+
+_inherited_evaluations = None
+
+def _init_batch_worker():
+    # workers cache in memory, the parent alone writes a persistent cache;
+    # the inherited one is kept referenced so that it is never closed here
+    global _evaluations, _inherited_evaluations
+    _inherited_evaluations = _evaluations
+    _evaluations = cache.LRUCache(_evaluations.maxsize)
+
+
+def _batch_call(args):
+    card_ids, optimize = args
+    cards = hand_from_ids(card_ids)
+    if optimize:
+        return optimize_call(cards)
+    return suggest_call(cards, verbose=False)
+
+
+def batch_calls(hands, optimize=False, processes=None, chunksize=64):
+    """
+    Bids for many hands, spread over a process pool and yielded in input
+    order: suggest_call values, or CallSuggestions with `optimize`. Hands
+    are lists of card ids or Player.cards; only the ids of the hands missing
+    from the evaluation cache are sent to the workers, and their results are
+    cached by this process.
+    """
+    hands = iter(hands)
+    key = _optimize_key if optimize else _suggest_key
+    pool = multiprocessing.Pool(processes, _init_batch_worker)
+    try:
+        while True:
+            block = [hand_ids(hand) for hand in itertools.islice(hands, chunksize * 16)]
+            if not block:
+                break
+            keys = [key(hand_from_ids(ids)) for ids in block]
+            results = [_evaluations.get(each) for each in keys]
+            missing = [i for i, result in enumerate(results) if result is None]
+            computed = pool.imap(_batch_call, [(block[i], optimize) for i in missing], chunksize)
+            for i, result in zip(missing, computed):
+                results[i] = _evaluations[keys[i]] = result
+            for result in results:
+                yield result
+    except BaseException:
+        # an error, or the caller stopped iterating
+        pool.terminate()
+        pool.join()
+        raise
+    pool.close()
+    pool.join()
+    if isinstance(_evaluations, cache.PersistentCache):
+        _evaluations.sync()
+
+
+def read_deal_hands(path):
+    """hands of every game record (simulate.play_game dicts) in a JSON lines file"""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                for hand in json.loads(line)['hands']:
+                    yield hand
+
+
+if __name__ == '__main__' and len(sys.argv) > 1:
+    # python call.py DEALS: bids every hand of the recorded deals
+    hands = list(read_deal_hands(sys.argv[1]))
+    for hand, chance in zip(hands, batch_calls(hands)):
+        print hand_from_ids(hand), chance
+elif __name__ == '__main__':
     card_storage = 'cards.pkl'
     if os.path.exists(card_storage):
         with open(card_storage, 'rb') as f:
@@ -61,4 +256,5 @@ if __name__ == '__main__':
         call = suggest_call(cards)
         total += call
         print call
+        print optimize_call(cards)
     print total
@@ -13,6 +13,9 @@ Faces.extend([
     Face('K', 13),
 ])
 
+FACE_BY_VALUE = dict((f.value, f) for f in Faces)
+FACE_BY_NAME = dict((f.name, f) for f in Faces)
+
 Suit = namedtuple('Suit', ('name', 'value', 'order', 'shape'))
 Suits = [
     Suit('spade',   2, 0, u'\u2660'),
@@ -21,65 +24,167 @@ Suits = [
     Suit('diamond', 1, 3, u'\u2662'),
 ]
 
+SUIT_BY_NAME = dict((s.name, s) for s in Suits)
+
 def make_card(face, suit):
-    face = face.upper()
-    for f in Faces:
-        if f.name == face:
-            break
-    else:
+    f = FACE_BY_NAME.get(face) or FACE_BY_NAME.get(face.upper())
+    if f is None:
         raise Exception("Face name supports A, 2-10, J, Q, and K. (%r given)" % face)
-    suit = suit.lower()
-    for s in Suits:
-        if s.name == suit:
-            break
-    else:
+    s = SUIT_BY_NAME.get(suit) or SUIT_BY_NAME.get(suit.lower())
+    if s is None:
         raise Exception("Suit name accepts spade, heart, club and diamont. (%r given)" % suit)
     return Card(f, s)
 
+def get_score(call, won):
+    """
+    Score of a round: making the call earns it plus a tenth for every extra
+    trick, falling short loses the whole call
+    """
+    if won >= call:
+        return call + (won - call) / 10.0
+    return -call
+
+def make_card_from_id(card_id):
+    return Card(FACE_BY_VALUE[card_id % 13 + 2], Suits[card_id // 13])
+
+def hand_from_ids(card_ids):
+    """arranged Hand of new cards with the given ids"""
+    hand = Hand()
+    for card_id in card_ids:
+        hand.add(make_card_from_id(card_id))
+    hand.arrange()
+    return hand
+
+def hand_ids(hand):
+    """card ids of a Hand, of per suit lists as in Player.cards or of ids"""
+    if isinstance(hand, Hand):
+        return hand.ids()
+    if hand and isinstance(hand[0], list):
+        return [card.id for suit_cards in hand for card in suit_cards]
+    return list(hand)
+
 class Card:
     def __init__(self, face, suit):
         self.face = face
         self.suit = suit
+        self.id = suit.order * 13 + face.value - 2  # 52-slot position, 2 to A per suit
 
     def __lt__(self, other):
+        # identical cards of different decks never beat each other, so the
+        # one played first wins
         if self.suit.name == other.suit.name:
             return self.face.value < other.face.value
         else:
             return self.suit.value < other.suit.value
 
+    def __setstate__(self, state):
+        # cards pickled before Card.id existed
+        self.__dict__.update(state)
+        self.id = self.suit.order * 13 + self.face.value - 2
+
     def __repr__(self):
-        return '%s%s ' % (self.face.name, self.suit.shape.encode('utf-8'))
+        return CARD_REPRS[self.id]
+
+# by Card.id, the suit shapes encoded once
+CARD_REPRS = [None] * 52
+for s in Suits:
+    for f in Faces:
+        CARD_REPRS[s.order * 13 + f.value - 2] = '%s%s ' % (f.name, s.shape.encode('utf-8'))
+del s, f
 
 
 class Deck:
-    def __init__(self):
+    def __init__(self, no_of_decks=1):
+        self.no_of_decks = no_of_decks
         self.cards = []
         self.load()
 
     def load(self):
-        self.cards[:] = [Card(f, s) for s in Suits for f in Faces]
+        self.cards[:] = [Card(f, s) for i in xrange(self.no_of_decks) for s in Suits for f in Faces]
+
+
+class Hand:
+    """
+    A player's cards, kept by suit: hand[suit.order] is the list of that
+    suit, highest first once arranged. Identical cards of different decks
+    are separate Card objects.
+    """
+    def __init__(self):
+        self.suits = [[] for s in Suits]
+        self.size = 0
+
+    def __getitem__(self, order):
+        return self.suits[order]
+
+    def __iter__(self):
+        return iter(self.suits)
+
+    def __repr__(self):
+        return repr(self.suits)
+
+    def add(self, card):
+        self.suits[card.suit.order].append(card)
+        self.size += 1
+
+    def remove(self, card):
+        self.suits[card.suit.order].remove(card)
+        self.size -= 1
+
+    def ids(self):
+        return [card.id for suit_cards in self.suits for card in suit_cards]
+
+    def arrange(self):
+        # stable, so identical cards keep the order they were dealt in
+        for each in self.suits:
+            each.sort(key=lambda c: -c.face.value)
+
+
+class GameListener:
+    """
+    Base for objects following a game, passed to CallBreak as listeners
+    """
+    def round_started(self, game):
+        pass
+
+    def player_to_play(self, turn, player):
+        pass
+
+    def card_played(self, turn, card):
+        """called once `card` has been added to turn.cards"""
+        pass
+
+    def turn_won(self, turn, winning_card):
+        pass
 
 
 class GameTurn:
-    def __init__(self, starter, players):
+    def __init__(self, starter, players, listeners=()):
         self.starter = starter
         self.players = players
+        self.listeners = listeners
         self.cards = []
         self.suit = None  # initialized after first card is played in this turn
 
     def start(self):
         for player in self.iterator():
+            for listener in self.listeners:
+                listener.player_to_play(self, player)
             card = player.play(self)
             if self.suit is None:
                 self.suit = card.suit
             self.cards.append(card)
+            for listener in self.listeners:
+                listener.card_played(self, card)
 
-        return self.get_winning_card()
+        winning_card = self.get_winning_card()
+        for listener in self.listeners:
+            listener.turn_won(self, winning_card)
+        return winning_card
 
     def get_winning_card(self):
         winning_card = max(self.cards)
 
-        logging.warn("%s's %s wins this turn", winning_card.owner, winning_card)
+        logging.info("%s's %s wins this turn", winning_card.owner, winning_card)
         logging.debug("-----")
         return winning_card
 
@@ -97,35 +202,62 @@ class GameTurn:
 class CallBreak:
     round_count = 0
 
-    def __init__(self, players):
-        self.deck = Deck()
+    def __init__(self, players, listeners=None, no_of_decks=1, hand_size=None):
+        """
+        Any number of players can play with one or more decks; by default
+        every card that can be dealt evenly is dealt.
+        """
+        self.deck = Deck(no_of_decks)
         self.players = players
+        self.listeners = list(listeners or [])
 
         for i, player in enumerate(players):
             player.turn = i
 
-        # TODO use different object for storing all cards when no_of_decks > 1
         self.cards = self.deck.cards
-
-    def ready(self):
-        self.shuffle()
+        self.hand_size = hand_size or len(self.cards) // len(players)
+        if self.hand_size * len(players) > len(self.cards):
+            raise Exception("%d decks cannot deal %d cards to %d players." % (
+                no_of_decks, self.hand_size, len(players)))
+        self.turns = []
+
+    def ready(self, cards=None):
+        """
+        shuffles and deals the cards, or deals `cards` in the given order
+        (e.g. to replay a recorded game)
+        """
+        self.turns = []
+        for player in self.players:
+            player.won = 0
+        if cards is None:
+            self.shuffle()
+        else:
+            self.cards[:] = cards
         self.distribute()
+        for listener in self.listeners:
+            listener.round_started(self)
 
     def start(self):
         starter = self.players[self.round_count]
-        for i in xrange(13):
-            turn = GameTurn(starter, self.players)
+        for i in xrange(self.hand_size):
+            turn = GameTurn(starter, self.players, self.listeners)
             winning_card = turn.start()
+            self.turns.append(turn)
             starter = winning_card.owner
+            starter.won += 1
 
     def shuffle(self):
         random.shuffle(self.cards)
 
     def distribute(self):
         player_count = len(self.players)
-        for i, card in enumerate(self.cards):
+        for player in self.players:
+            player.cards = Hand()
+        for i, card in enumerate(self.cards[:self.hand_size * player_count]):
             player = self.players[i % player_count]
             player.collect(card)
+        for player in self.players:
+            player.arrange()
 
 
 class Player:
@@ -133,7 +265,10 @@ class Player:
         self.name = name
         self.is_bot = is_bot
         self.turn = None  # overriden by int in CallBreak
-        self.cards = [[], [], [], []]
+        self.cards = Hand()
+        self.call = None
+        self.won = 0  # tricks won in the current round
+        self.controller = None  # picks cards for human players, see wait_until_human_plays
 
     @property
     def all_cards(self):
@@ -141,16 +276,19 @@ class Player:
 
     def collect(self, card):
         card.owner = self
-        self.cards[card.suit.order].append(card)
+        self.cards.add(card)
 
-        if len(self.all_cards) == 13:
-            [each.sort(key=lambda c: -c.face.value) for each in self.cards]
-            for i, card in enumerate(self.all_cards):
-                card.index = i
+    def arrange(self):
+        """sorts the cards once they are all dealt"""
+        self.cards.arrange()
+        for i, card in enumerate(self.all_cards):
+            card.index = i
 
     def get_greater_cards(self, turn, cards):
-        greater_cards = filter(lambda c: c > max(turn.cards) if turn.cards else True, cards)
-        return greater_cards
+        if not turn.cards:
+            return cards
+        winning_card = max(turn.cards)
+        return [c for c in cards if c > winning_card]
 
     def get_legal_cards(self, turn):
         if turn.suit is None:
@@ -173,16 +311,18 @@ class Player:
         if not self.is_bot:
             raise Exception('Humans cannot use machine brain.')
 
-        if has_greater_card and len(turn.cards) < 3:
+        if has_greater_card and len(turn.cards) < len(turn.players) - 1:
             return max(legal_cards)
         else:
             return min(legal_cards)
 
     def wait_until_human_plays(self, turn, legal_cards):
-        raise NotImplementedError('coming soon ...')
+        if self.controller is None:
+            raise NotImplementedError('coming soon ...')
+        return self.controller.choose_card(self, turn, legal_cards)
 
     def play(self, turn):
-        print "%s's cards:" % self.name, self.cards
+        logging.debug("%s's cards: %s", self.name, self.cards)
 
         legal_cards, has_greater_card = self.get_legal_cards(turn)
 
@@ -191,9 +331,9 @@ class Player:
         else:
             card = self.wait_until_human_plays(turn, legal_cards)
 
-        self.cards[card.suit.order].remove(card)
+        self.cards.remove(card)
 
-        logging.warn('%r plays %s', self, card)
+        logging.info('%r plays %s', self, card)
         return card
 
     def __repr__(self):
@@ -0,0 +1,106 @@
+"""
+Streams simulated games into fixed width NumPy shards for model training.
+
+Each shard is an .npz file holding `shard_size` games:
+
+    seeds    (games,)         int64  seed of the deal
+    hands    (games, 4, 52)   uint8  one-hot 52-slot hand of each seat
+    calls    (games, 4)       int8   call of each seat
+    leaders  (games, 13)      int8   seat leading each trick
+    plays    (games, 13, 4)   int8   card id played by each seat in each trick
+    won      (games, 4)       int8   tricks won by each seat
+
+Shards are produced in parallel by a process pool, each worker holding only
+the shard it is filling, and listed in a JSON manifest next to them.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+import simulate
+
+FIELDS = [
+    ('seeds', 'int64', ()),
+    ('hands', 'uint8', (4, 52)),
+    ('calls', 'int8', (4,)),
+    ('leaders', 'int8', (13,)),
+    ('plays', 'int8', (13, 4)),
+    ('won', 'int8', (4,)),
+]
+
+MANIFEST = 'manifest.json'
+
+
+def allocate(games):
+    return dict((name, np.zeros((games,) + shape, dtype=dtype)) for name, dtype, shape in FIELDS)
+
+
+def encode_game(record, arrays, row):
+    arrays['seeds'][row] = record['seed']
+    for seat, hand in enumerate(record['hands']):
+        arrays['hands'][row, seat, hand] = 1
+    arrays['calls'][row] = record['calls']
+    arrays['won'][row] = record['won']
+    for i, (leader, cards) in enumerate(record['tricks']):
+        arrays['leaders'][row, i] = leader
+        for j, card in enumerate(cards):
+            arrays['plays'][row, i, (leader + j) % 4] = card
+
+
+def write_shard(args):
+    directory, shard, first_seed, games, compress = args
+    arrays = allocate(games)
+    for row in xrange(games):
+        encode_game(simulate.play_game(first_seed + row), arrays, row)
+
+    name = 'shard-%05d.npz' % shard
+    save = np.savez_compressed if compress else np.savez
+    save(os.path.join(directory, name), **arrays)
+    return {'path': name, 'games': games, 'first_seed': first_seed}
+
+
+def export(directory, games, shard_size=10000, first_seed=0, processes=None, compress=False):
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    jobs = []
+    for shard, start in enumerate(xrange(0, games, shard_size)):
+        jobs.append((directory, shard, first_seed + start, min(shard_size, games - start), compress))
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        # shards come back in order, only their metadata is kept
+        shards = list(pool.imap(write_shard, jobs))
+    finally:
+        pool.close()
+        pool.join()
+
+    manifest = {
+        'games': games,
+        'shard_size': shard_size,
+        'fields': dict((name, [dtype, list(shape)]) for name, dtype, shape in FIELDS),
+        'shards': shards,
+    }
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def iter_shards(directory):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    for shard in manifest['shards']:
+        with np.load(os.path.join(directory, shard['path'])) as data:
+            yield dict((name, data[name]) for name in data.files)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'dataset'
+    games = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    manifest = export(directory, games)
+    print 'written %d games in %d shards to %s' % (games, len(manifest['shards']), directory)
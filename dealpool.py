@@ -0,0 +1,121 @@
+"""
+Deals shared by simulation worker processes.
+
+A producer process shuffles card ids into a ring of deal slots in shared
+memory; workers take the deals in order, read the ids in place into Card
+objects they allocated once and write the calls and tricks won into a
+shared result array indexed by deal, so nothing is pickled per deal.
+
+Deal n is shuffled like simulate.play_game(first_seed + n), so both give the
+same games.
+"""
+import multiprocessing
+import random
+import sys
+import time
+
+from callbreak_card import CallBreak, Deck
+import simulate
+
+DECK_IDS = [card.id for card in Deck().cards]
+DEAL_SIZE = len(DECK_IDS)
+SEATS = 4
+RESULT_SIZE = 2 * SEATS  # calls, then tricks won, by seat
+
+
+class DealPool:
+    def __init__(self, count, capacity=256, first_seed=0):
+        self.count = count
+        self.capacity = capacity
+        self.first_seed = first_seed
+        self.deals = multiprocessing.RawArray('b', capacity * DEAL_SIZE)
+        self.results = multiprocessing.RawArray('b', count * RESULT_SIZE)
+        # a slot is written once free and read once filled
+        self.free = [multiprocessing.Semaphore(1) for i in xrange(capacity)]
+        self.filled = [multiprocessing.Semaphore(0) for i in xrange(capacity)]
+        self.next_deal = multiprocessing.RawValue('l', 0)
+        self.lock = multiprocessing.Lock()
+
+    def produce(self):
+        rng = random.Random()
+        for n in xrange(self.count):
+            slot = n % self.capacity
+            self.free[slot].acquire()
+            rng.seed(self.first_seed + n)
+            cards = DECK_IDS[:]
+            rng.shuffle(cards)
+            base = slot * DEAL_SIZE
+            self.deals[base:base + DEAL_SIZE] = cards
+            self.filled[slot].release()
+
+    def take(self):
+        """
+        Number and slot of the next deal, waiting for it to be filled, or
+        None once every deal is taken. The slot must be released once read.
+        """
+        with self.lock:
+            # waiting under the lock, so deals are read in the order taken
+            n = self.next_deal.value
+            if n >= self.count:
+                return None
+            self.next_deal.value = n + 1
+            slot = n % self.capacity
+            self.filled[slot].acquire()
+        return n, slot
+
+    def release(self, slot):
+        self.free[slot].release()
+
+    def result(self, n):
+        """calls and tricks won of deal n, by seat"""
+        base = n * RESULT_SIZE
+        return list(self.results[base:base + SEATS]), list(self.results[base + SEATS:base + RESULT_SIZE])
+
+
+def simulate_deals(pool):
+    players = simulate.make_players(SEATS)
+    game = CallBreak(players)
+    by_id = dict((card.id, card) for card in game.cards)
+    deals, results = pool.deals, pool.results
+    while True:
+        taken = pool.take()
+        if taken is None:
+            break
+        n, slot = taken
+        base = slot * DEAL_SIZE
+        cards = [by_id[deals[base + i]] for i in xrange(DEAL_SIZE)]
+        pool.release(slot)
+
+        game.ready(cards)
+        simulate.make_calls(game)
+        game.start()
+        base = n * RESULT_SIZE
+        for seat, player in enumerate(players):
+            results[base + seat] = player.call
+            results[base + SEATS + seat] = player.won
+
+
+def run(count, processes=None, capacity=256, first_seed=0):
+    """simulates `count` deals on all cores and returns the DealPool holding the results"""
+    pool = DealPool(count, capacity, first_seed)
+    producer = multiprocessing.Process(target=pool.produce)
+    workers = [multiprocessing.Process(target=simulate_deals, args=(pool,))
+               for i in xrange(processes or multiprocessing.cpu_count())]
+    producer.start()
+    for worker in workers:
+        worker.start()
+    for process in [producer] + workers:
+        process.join()
+    return pool
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    start = time.time()
+    pool = run(count)
+    elapsed = time.time() - start
+    print '%d deals in %.2f s, %.0f deals/s' % (count, elapsed, count / elapsed)
+    for n in xrange(3):
+        record = simulate.play_game(n)
+        assert pool.result(n) == (record['calls'], record['won'])
+        print n, pool.result(n)
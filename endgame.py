@@ -0,0 +1,290 @@
+"""
+Endgame tablebase for the last tricks of a round.
+
+A position at the start of a trick is stored in a compressed form: for each
+suit, the seats holding its remaining cards from the highest card down, with
+seats numbered from the leader of the trick. Only the relative order of the
+remaining cards matters for the play, and hearts, clubs and diamonds are
+interchangeable, so they are sorted into a normal form.
+
+Every seat plays to maximize its own tricks, breaking ties against the seats
+after it in playing order, so the result does not depend on how suits or
+seats are labelled. The table stores the tricks each seat takes from the
+position on. It is generated once with `generate` and looked up through a
+memory-mapped `EndgameTable`.
+"""
+import itertools
+import mmap
+import struct
+import sys
+
+PLAYERS = 4
+MAX_CARDS = 3  # tricks per seat are packed in two bits
+UNSOLVED = 0xFF
+
+MAGIC = 'CBEG1'
+HEADER = struct.Struct('<5sB')
+SECTION = struct.Struct('<QQ')
+
+_multinomials = {}
+
+def multinomial(counts):
+    counts = tuple(counts)
+    if counts not in _multinomials:
+        total = 1
+        n = 0
+        for count in counts:
+            for i in xrange(1, count + 1):
+                n += 1
+                total = total * n // i
+        _multinomials[counts] = total
+    return _multinomials[counts]
+
+
+def compositions(total, parts=4):
+    if parts == 1:
+        yield (total,)
+        return
+    for first in xrange(total + 1):
+        for rest in compositions(total - first, parts - 1):
+            yield (first,) + rest
+
+
+def owner_sequences(counts):
+    """
+    Sequences where seat `i` appears `counts[i]` times, in lexicographic
+    order so that their position matches rank_sequence
+    """
+    if not any(counts):
+        yield ()
+        return
+    counts = list(counts)
+    for seat, count in enumerate(counts):
+        if count:
+            counts[seat] -= 1
+            for rest in owner_sequences(counts):
+                yield (seat,) + rest
+            counts[seat] += 1
+
+
+def rank_sequence(sequence, counts):
+    counts = list(counts)
+    rank = 0
+    for seat in sequence:
+        for lower in xrange(seat):
+            if counts[lower]:
+                counts[lower] -= 1
+                rank += multinomial(counts)
+                counts[lower] += 1
+        counts[seat] -= 1
+    return rank
+
+
+class Layout:
+    """Index arithmetic for positions with `cards` cards per seat"""
+    def __init__(self, cards):
+        self.cards = cards
+        self.counts = (cards,) * PLAYERS
+        self.sequences = multinomial(self.counts)
+        self.compositions = list(compositions(PLAYERS * cards))
+        self.composition_index = dict((c, i) for i, c in enumerate(self.compositions))
+        self.size = len(self.compositions) * self.sequences
+
+    def index(self, suits):
+        composition = tuple(len(each) for each in suits)
+        sequence = tuple(itertools.chain.from_iterable(suits))
+        return (self.composition_index[composition] * self.sequences +
+                rank_sequence(sequence, self.counts))
+
+
+def _side_suit_key(owners):
+    return len(owners), owners
+
+
+def canonicalize(suits, leader):
+    """
+    Renumbers seats from `leader` and sorts the side suits. `suits` holds,
+    for spade, heart, club and diamond, the seats owning the remaining cards
+    from the highest down.
+    """
+    suits = [tuple((seat - leader) % PLAYERS for seat in owners) for owners in suits]
+    return [suits[0]] + sorted(suits[1:], key=_side_suit_key)
+
+
+def is_canonical(suits):
+    keys = [_side_suit_key(owners) for owners in suits[1:]]
+    return keys == sorted(keys)
+
+
+def _hands(suits):
+    hands = [[] for i in xrange(PLAYERS)]
+    for suit, owners in enumerate(suits):
+        for i, seat in enumerate(owners):
+            # rank grows with the strength of the card
+            hands[seat].append((suit, len(owners) - i))
+    return hands
+
+
+def _suit_value(suit):
+    return 2 if suit == 0 else 1
+
+
+def _greater(card, winner):
+    if card[0] == winner[0]:
+        return card[1] > winner[1]
+    return _suit_value(card[0]) > _suit_value(winner[0])
+
+
+def legal_cards(hand, led, winner):
+    """Same rule as Player.get_legal_cards, on (suit, rank) pairs"""
+    if led is None:
+        return hand
+    same_suit = [card for card in hand if card[0] == led]
+    if same_suit:
+        greater = [card for card in same_suit if _greater(card, winner)]
+        return greater or same_suit
+    spades = [card for card in hand if card[0] == 0]
+    greater = [card for card in spades if _greater(card, winner)]
+    return greater or hand
+
+
+class _Solver:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def after_trick(self, hands, winner):
+        cards = len(hands[0])
+        if not cards:
+            return (0,) * PLAYERS
+        suits = [[] for i in xrange(4)]
+        for seat, hand in enumerate(hands):
+            for suit, rank in hand:
+                suits[suit].append((rank, seat))
+        suits = [tuple(seat for rank, seat in sorted(each, reverse=True)) for each in suits]
+        layout, table = self.tables[cards]
+        value = table[layout.index(canonicalize(suits, winner))]
+        tricks = unpack(value, cards)
+        return tuple(tricks[(seat - winner) % PLAYERS] for seat in xrange(PLAYERS))
+
+    @staticmethod
+    def preference(result, seat):
+        return (result[seat],) + tuple(-result[(seat + i) % PLAYERS] for i in xrange(1, PLAYERS))
+
+    def play(self, hands, seat, led, winner, winner_seat):
+        if seat == PLAYERS:
+            tricks = list(self.after_trick(hands, winner_seat))
+            tricks[winner_seat] += 1
+            return tuple(tricks)
+
+        hand = hands[seat]
+        best = None
+        for card in legal_cards(hand, led, winner):
+            hands[seat] = [each for each in hand if each != card]
+            if led is None or _greater(card, winner):
+                result = self.play(hands, seat + 1, card[0] if led is None else led, card, seat)
+            else:
+                result = self.play(hands, seat + 1, led, winner, winner_seat)
+            if best is None or self.preference(result, seat) > self.preference(best, seat):
+                best = result
+        hands[seat] = hand
+        return best
+
+    def solve(self, suits):
+        return self.play(_hands(suits), 0, None, None, None)
+
+
+def pack(tricks):
+    return tricks[0] | tricks[1] << 2 | tricks[2] << 4
+
+
+def unpack(value, cards):
+    if value == UNSOLVED:
+        raise KeyError('Position is missing from the endgame table.')
+    tricks = [value & 3, value >> 2 & 3, value >> 4 & 3]
+    tricks.append(cards - sum(tricks))
+    return tricks
+
+
+def generate(path, max_cards=2, progress=None):
+    """
+    Solves every canonical position with up to `max_cards` cards per seat
+    and writes the table to `path`. Two cards per seat take under a minute,
+    three are an offline job.
+    """
+    if not 1 <= max_cards <= MAX_CARDS:
+        raise ValueError('max_cards supports 1 to %d. (%r given)' % (MAX_CARDS, max_cards))
+
+    tables = {}
+    solver = _Solver(tables)
+    for cards in xrange(1, max_cards + 1):
+        layout = Layout(cards)
+        table = bytearray([UNSOLVED]) * layout.size
+        tables[cards] = layout, table
+        index = 0
+        for composition in layout.compositions:
+            for sequence in owner_sequences(layout.counts):
+                suits = []
+                start = 0
+                for length in composition:
+                    suits.append(sequence[start:start + length])
+                    start += length
+                if is_canonical(suits):
+                    table[index] = pack(solver.solve(suits))
+                index += 1
+            if progress:
+                progress(cards, composition)
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, max_cards))
+        offset = HEADER.size + SECTION.size * max_cards
+        for cards in xrange(1, max_cards + 1):
+            f.write(SECTION.pack(offset, tables[cards][0].size))
+            offset += tables[cards][0].size
+        for cards in xrange(1, max_cards + 1):
+            f.write(tables[cards][1])
+
+
+class EndgameTable:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.max_cards = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise Exception('%r is not an endgame table.' % path)
+        self.sections = {}
+        for cards in xrange(1, self.max_cards + 1):
+            offset, size = SECTION.unpack_from(self.data, HEADER.size + SECTION.size * (cards - 1))
+            self.sections[cards] = Layout(cards), offset
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def lookup(self, hands, leader):
+        """
+        Tricks each seat takes from here on, given the cards in every seat's
+        hand (in seat order) at the start of a trick led by seat `leader`
+        """
+        cards = len(hands[0])
+        if cards == 0:
+            return [0] * PLAYERS
+        if cards not in self.sections or any(len(hand) != cards for hand in hands):
+            raise KeyError('Position is not covered by the endgame table.')
+
+        suits = [[] for i in xrange(4)]
+        for seat, hand in enumerate(hands):
+            for card in hand:
+                suits[card.suit.order].append((card.face.value, seat))
+        suits = [tuple(seat for value, seat in sorted(each, reverse=True)) for each in suits]
+
+        layout, offset = self.sections[cards]
+        value = ord(self.data[offset + layout.index(canonicalize(suits, leader))])
+        tricks = unpack(value, cards)
+        return [tricks[(seat - leader) % PLAYERS] for seat in xrange(PLAYERS)]
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else 'endgame.tbl'
+    max_cards = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    generate(path, max_cards)
+    print 'written', path
@@ -0,0 +1,84 @@
+"""
+Turns game records into PNG frame sequences, one directory per game,
+rendering distinct games in parallel worker processes.
+
+    python export_frames.py OUTPUT [--games N] [--records FILE] [--processes N]
+
+The sequences play at main.FPS, e.g.
+    ffmpeg -framerate 30 -i OUTPUT/game-000000/frame-%06d.png game.mp4
+and OUTPUT/manifest.json lists them.
+"""
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import json
+import multiprocessing
+
+import main as ui
+import render_bench
+import simulate
+import tween
+
+MANIFEST = 'manifest.json'
+
+_cb_ui = None  # one off-screen window per worker process
+
+
+def _init_worker():
+    global _cb_ui
+    _cb_ui = ui.CallBreakUI(depth=32)  # the dummy driver defaults to 8 bits
+
+
+def export_game(args):
+    index, record, directory = args
+    name = 'game-%06d' % index
+    game_dir = os.path.join(directory, name)
+    if not os.path.isdir(game_dir):
+        os.makedirs(game_dir)
+
+    clock = render_bench.FrameClock(_cb_ui.screen, game_dir)
+    ui.set_clock(clock)
+    tween.set_time_source(clock.now)
+    render_bench.render_game(_cb_ui, record, clock)
+    return {'game': index, 'seed': record.get('seed'), 'path': name, 'frames': clock.frames}
+
+
+def export(records, directory, processes=None):
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    jobs = ((index, record, directory) for index, record in enumerate(records))
+    pool = multiprocessing.Pool(processes, _init_worker)
+    try:
+        games = list(pool.imap(export_game, jobs))
+    finally:
+        pool.close()
+        pool.join()
+
+    manifest = {'fps': ui.FPS, 'games': games}
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('output', help='directory to write the frames in')
+    parser.add_argument('--games', type=int, default=4, help='simulated games to export')
+    parser.add_argument('--records', help='JSON lines file of game records to export instead')
+    parser.add_argument('--processes', type=int, help='worker processes, all cores by default')
+    args = parser.parse_args()
+
+    if args.records:
+        records = render_bench.read_records(args.records)
+    else:
+        records = (simulate.play_game(seed) for seed in xrange(args.games))
+
+    manifest = export(records, args.output, args.processes)
+    print 'exported %d games, %d frames' % (len(manifest['games']),
+                                            sum(game['frames'] for game in manifest['games']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Legal moves as table lookups on card masks (see tracker.py).
+
+Player.get_legal_cards only depends on the hand's holding in the suit led
+and in spades and on the card winning the trick, so the outcomes are
+precomputed per 13-bit suit holding and rank of the winning card:
+
+    BEAT[rank][holding]    cards of the holding above `rank`
+    FOLLOW[rank][holding]  the cards above `rank` if any, else the holding
+
+Masks hold a single deck, a card being bit Card.id.
+"""
+from tracker import SUIT_SIZE, SPADE
+
+HOLDINGS = 1 << SUIT_SIZE
+SUIT_MASK = HOLDINGS - 1
+
+BEAT = [[holding & ~((2 << rank) - 1) for holding in xrange(HOLDINGS)] for rank in xrange(SUIT_SIZE)]
+FOLLOW = [[beat or holding for holding, beat in enumerate(BEAT[rank])] for rank in xrange(SUIT_SIZE)]
+
+
+def legal_mask(hand_mask, lead_suit=None, winner=None):
+    """
+    Mask of the cards of `hand_mask` that can be played in a trick led in
+    suit order `lead_suit` and won so far by card id `winner`; any card
+    when leading
+    """
+    if lead_suit is None:
+        return hand_mask
+    winner_suit, winner_rank = divmod(winner, SUIT_SIZE)
+
+    shift = lead_suit * SUIT_SIZE
+    holding = hand_mask >> shift & SUIT_MASK
+    if holding:
+        if winner_suit == lead_suit:
+            return FOLLOW[winner_rank][holding] << shift
+        return holding << shift  # trumped, nothing in the suit beats it
+
+    spades = hand_mask & SUIT_MASK
+    if spades:
+        if winner_suit != SPADE:
+            return spades
+        beat = BEAT[winner_rank][spades]
+        if beat:
+            return beat
+    return hand_mask
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    from callbreak_card import CallBreak, GameTurn
+    from tracker import hand_mask
+    import simulate
+
+    # same outcome as Player.get_legal_cards on random tricks
+    states = []
+    for seed in xrange(2000):
+        random.seed(seed)
+        game = CallBreak(simulate.make_players())
+        game.ready()
+        leader, player = random.sample(game.players, 2)
+        turn = GameTurn(leader, game.players)
+        turn.cards = [random.choice(leader.all_cards)]
+        turn.suit = turn.cards[0].suit
+        if random.random() < 0.5:
+            other = [p for p in game.players if p not in (leader, player)][0]
+            turn.cards.append(random.choice(other.all_cards))
+        legal_cards, has_greater_card = player.get_legal_cards(turn)
+        mask = hand_mask(player.cards)
+        winner = max(turn.cards).id
+        assert legal_mask(mask, turn.suit.order, winner) == hand_mask(legal_cards)
+        states.append((mask, turn.suit.order, winner))
+
+    start = time.time()
+    for mask, lead_suit, winner in states * 50:
+        legal_mask(mask, lead_suit, winner)
+    print 'legal_mask %.2f us' % ((time.time() - start) / len(states) / 50 * 1e6)
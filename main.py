@@ -6,18 +6,49 @@ import sys
 import pygame
 import math
 from pgu import text, gui as pgui
-from callbreak_card import CallBreak, GameTurn, Player
+from callbreak_card import CallBreak, GameListener, Player
+import tween
 from pygame.locals import *
 
 WHITE = (255, 255, 255)
 RED = (255, 0, 0)
 BLACK = (0, 0, 0)
 FPS = 30
-clock = pygame.time.Clock()
+_clock = None
 screenSize = (960, 540)
+LABEL_CACHE_SIZE = 256
+_fonts = {}
+_labels = collections.OrderedDict()
 lines = []
 lineLimit = 20
 
+def get_font(name="monospace", size=18):
+    # SysFont scans the system fonts on every call
+    key = name, size
+    if key not in _fonts:
+        _fonts[key] = pygame.font.SysFont(name, size)
+    return _fonts[key]
+
+def render_text(txt, color=BLACK, font=("monospace", 18), rotation=0):
+    """
+    rendered (and rotated) text, kept in a small LRU cache keyed by
+    everything that affects the pixels
+    """
+    key = font, txt, color, rotation
+    label = _labels.pop(key, None)
+    if label is None:
+        label = get_font(*font).render(txt, 1, color)
+        if rotation:
+            label = pygame.transform.rotate(label, rotation)
+        if len(_labels) >= LABEL_CACHE_SIZE:
+            _labels.popitem(last=False)
+    _labels[key] = label
+    return label
+
+def wait_for_event():
+    """blocks until the next event instead of polling"""
+    return pygame.event.wait()
+
 def logInputAction(txt):
     text = txt.value
     return text
@@ -55,7 +86,7 @@ def setplayer():
     global lines, txts
     pygame.init()
     pygame.font.init()
-    font = pygame.font.SysFont("monospace", 18)
+    font = get_font("monospace", 18)
     # fontBig = pygame.font.SysFont("monospace", 18)
     # fontSub = pygame.font.SysFont("monospace", 18)
     screen = pygame.display.set_mode(screenSize)
@@ -117,31 +148,33 @@ def setplayer():
     screen.fill(WHITE)
 
     gui.init(lo)
+
+    # clear background
+    screen.fill((250, 250, 250))
+
+    # Draw GUI once, afterwards only the widgets which changed
+    gui.paint(screen)
+    edText = "\n".join(lines)
+    text.writepre(screen, font, textArea1, (0,0,0), edText)
+    text.writepre(screen, font, textArea2, (1,1,1), edText)
+    text.writepre(screen, font, textArea3, (2,2,2), edText)
+    text.writepre(screen, font, textArea4, (3,3,3), edText)
+    pygame.display.flip()
    
     while 1:
         #Handle Input Events
-        time.sleep(0.03)
-        for event in pygame.event.get():
-
-            if event.type == QUIT:
-                return
-            elif event.type == KEYDOWN and event.key == K_ESCAPE:
-                return
+        event = wait_for_event()
+        if event.type == QUIT:
+            return
+        elif event.type == KEYDOWN and event.key == K_ESCAPE:
+            return
         
         # pass event to gui
         gui.event(event)
 
-        # clear background
-        screen.fill((250, 250, 250))
-        
-        # Draw GUI
-        gui.paint(screen)
-        edText = "\n".join(lines)
-        text.writepre(screen, font, textArea1, (0,0,0), edText)
-        text.writepre(screen, font, textArea2, (1,1,1), edText)
-        text.writepre(screen, font, textArea3, (2,2,2), edText)
-        text.writepre(screen, font, textArea4, (3,3,3), edText)
-        pygame.display.flip()
+        dirty_rects = gui.update(screen) or []
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
 
 
 
@@ -152,7 +185,8 @@ class MenuItem(pygame.font.Font):
         self.text = text
         self.font_size = font_size
         self.font_color = font_color
-        self.label = self.render(self.text, 1, self.font_color)
+        self.labels = {}  # rendered text by (color, italic)
+        self.label = self.render_label()
         self.width = self.label.get_rect().width
         self.height = self.label.get_rect().height
         self.dimensions = (self.width, self.height)
@@ -165,9 +199,15 @@ class MenuItem(pygame.font.Font):
         self.pos_x = x
         self.pos_y = y
  
+    def render_label(self):
+        key = self.font_color, self.get_italic()
+        if key not in self.labels:
+            self.labels[key] = self.render(self.text, 1, self.font_color)
+        return self.labels[key]
+
     def set_font_color(self, rgb_tuple):
         self.font_color = rgb_tuple
-        self.label = self.render(self.text, 1, self.font_color)
+        self.label = self.render_label()
  
     def is_mouse_selection(self, (posx, posy)):
         if (posx >= self.pos_x and posx <= self.pos_x + self.width) and \
@@ -185,7 +225,6 @@ class GameMenu:
         self.scr_height = self.screen.get_rect().height
  
         self.bg_color = bg_color
-        self.clock = pygame.time.Clock()
         self.funcs = funcs
         self.items = []
 
@@ -249,65 +288,45 @@ class GameMenu:
             item.set_font_color(BLACK)
             item.set_italic(False)
  
+    def draw(self, mpos):
+        # Redraw the background
+        self.screen.fill(self.bg_color)
+
+        for item in self.items:
+            if self.mouse_is_visible:
+                self.set_mouse_selection(item, mpos)
+            self.screen.blit(item.label, item.position)
+
+        pygame.display.flip()
+
     def run(self):
         mainloop = True
+        self.draw(pygame.mouse.get_pos())
         while mainloop:
-            self.clock.tick(50)
+            # nothing changes on the menu between events
+            event = wait_for_event()
             mpos = pygame.mouse.get_pos()
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    mainloop = False
-                if event.type == pygame.KEYDOWN:
-                        self.mouse_is_visible = False
-                        self.set_keyboard_selection(event.key)
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    for item in self.items:
-                        if item.is_mouse_selection(mpos):
-                            self.funcs[item.text]()
- 
-            if pygame.mouse.get_rel() != (0, 0):
+            if event.type == pygame.QUIT:
+                mainloop = False
+            if event.type == pygame.KEYDOWN:
+                    self.mouse_is_visible = False
+                    self.set_keyboard_selection(event.key)
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                for item in self.items:
+                    if item.is_mouse_selection(mpos):
+                        self.funcs[item.text]()
+            if event.type == pygame.MOUSEMOTION:
                 self.mouse_is_visible = True
                 self.cur_item = None
- 
+
             self.set_mouse_visibility()
- 
-            # Redraw the background
-            self.screen.fill(self.bg_color)
- 
-            for item in self.items:
-                if self.mouse_is_visible:
-                    self.set_mouse_selection(item, mpos)
-                self.screen.blit(item.label, item.position)
- 
-            pygame.display.flip()
-            self.screen.fill((255,255,255))
+            self.draw(mpos)
 
 try:
     import android 
 except ImportError:
     android = None
 
-def get_animation_positions(pos1, pos2, fps, delay):
-    if hasattr(pos1, 'x'):
-        x1, y1 = pos1.x, pos1.y
-    else:
-        x1, y1 = pos1
-    if hasattr(pos2, 'x'):
-        x2, y2 = pos2.x, pos2.y
-    else:
-        x2, y2 = pos2
-    num = int(fps * delay)
-
-    delta_x = (x2 - x1)/num
-    delta_y = (y2 - y1)/num
-    points = []
-    x, y = x1, y1
-    for i in xrange(num):
-        x += delta_x
-        y += delta_y
-        points.append((x, y))
-    return points
-
 def get_front_image(card):
     suit_name = card.suit.name[0].upper()
     face_name = card.face.name.upper()
@@ -342,51 +361,72 @@ def unionall_rects(rects):
 
 
 
-GameTurn_start = GameTurn.start
-def start(self):
-    # import ipdb; ipdb.set_trace();
-    winning_card = GameTurn_start(self)
-    winner = winning_card.owner
-    time.sleep(1)
-    winner.ui.collect(self.cards)
-    return winning_card
-GameTurn.start = start
-
-
-
-Player_play = Player.play
-def play(self, turn):
-    if self.is_bot:
-        time.sleep(1)
-    playerui = self.ui
-    playerui.screen.fill(WHITE, playerui.rect)
-
-    card = Player_play(self, turn)
-    playerui.throw(card, turn)
-    playerui.unfold_cards()
-    return card
-Player.play = play
-
-
-def wait_until_human_plays(self, turn, legal_cards):
-    while True:
-        for event in pygame.event.get():
-            # Android-specific:
-            if android:
-                if android.check_pause():
-                    android.wait_for_resume()
+def get_clock():
+    # created on first use so that importing this module has no side effect
+    global _clock
+    if _clock is None:
+        _clock = pygame.time.Clock()
+    return _clock
+
+def set_clock(clock):
+    """
+    replaces the frame clock, anything with a tick(fps) method; one with a
+    frame_drawn() method is also told about every frame drawn
+    """
+    global _clock
+    _clock = clock
+
+def frame_drawn():
+    hook = getattr(get_clock(), 'frame_drawn', None)
+    if hook is not None:
+        hook()
+
+
+class GameUI(GameListener):
+    """
+    Animates the game on the players' PlayerUI, registered as a listener of
+    CallBreak. `pause` is the time in seconds given to follow each move.
+    """
+    def __init__(self, pause=1):
+        self.pause = pause
+
+    def player_to_play(self, turn, player):
+        if player.is_bot and self.pause:
+            time.sleep(self.pause)
+        playerui = player.ui
+        playerui.screen.fill(WHITE, playerui.rect)
+
+    def card_played(self, turn, card):
+        playerui = card.owner.ui
+        playerui.throw(card, turn)
+        playerui.unfold_cards()
+
+    def turn_won(self, turn, winning_card):
+        if self.pause:
+            time.sleep(self.pause)
+        winning_card.owner.ui.collect(turn.cards)
+
+
+class HumanController:
+    """Lets the player on this device pick a card with the mouse"""
+    def choose_card(self, player, turn, legal_cards):
+        while True:
+            for event in pygame.event.get():
+                # Android-specific:
+                if android:
+                    if android.check_pause():
+                        android.wait_for_resume()
 
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                x, y = event.pos
-                for card in self.all_cards[::-1]:
-                    if card.ui.rect.collidepoint(x, y):
-                        if card in legal_cards:
-                            pygame.event.clear()
-                            return card
-                        else:
-                            break
-        clock.tick(FPS)
-Player.wait_until_human_plays = wait_until_human_plays
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    x, y = event.pos
+                    for card in player.all_cards[::-1]:
+                        if card.ui.rect.collidepoint(x, y):
+                            if card in legal_cards:
+                                pygame.event.clear()
+                                return card
+                            else:
+                                break
+            get_clock().tick(FPS)
 
 
 class CardUI:
@@ -421,11 +461,18 @@ class CardUI:
         # only once displayed cards can be moved
         self.display(self.rect)
 
-    def move(self, new_pos, before_callback=None, after_callback=None, disappear=False, delay=0.2):
-        return CardUI.move_simultaneously([self.card], [new_pos], before_callback, after_callback, disappear, delay)
+    def move(self, new_pos, before_callback=None, after_callback=None, disappear=False, delay=0.2,
+             easing=tween.ease_out_quad):
+        return CardUI.move_simultaneously([self.card], [new_pos], before_callback, after_callback, disappear, delay,
+                                          easing)
 
     @staticmethod
-    def move_simultaneously(cards, all_new_pos, before_callback=None, after_callback=None, disappear=False, delay=0.2):
+    def move_simultaneously(cards, all_new_pos, before_callback=None, after_callback=None, disappear=False, delay=0.2,
+                            easing=tween.ease_out_quad):
+        """
+        moves the cards to their new positions in `delay` seconds, drawing
+        as many frames as the time allows
+        """
         def _callback(c):
             if c:
                 if isinstance(c, collections.Iterable):
@@ -433,23 +480,29 @@ class CardUI:
                 else:
                     c()
         last_sprite_rects = [card.ui.rect for card in cards]
-        all_positions = [get_animation_positions(card.ui.rect, new_pos, FPS, delay) for card, new_pos in zip(cards, all_new_pos)]
-        for i, positions in enumerate(zip(*all_positions)):
+        started = tween.now()
+        tweens = [tween.Tween(card.ui.rect, new_pos, delay, easing, started) for card, new_pos in zip(cards, all_new_pos)]
+        finished = False
+        while not finished:
+            at = tween.now()
+            finished = at - started >= delay
             [card.ui.screen.fill(WHITE, rect) for rect in last_sprite_rects]
 
             _callback(before_callback)
-            if not (disappear and i == len(all_positions[0]) - 1):
-                last_sprite_rects = [card.ui.display(positions[j]) for j, card in enumerate(cards)]
+            if not (disappear and finished):
+                last_sprite_rects = [card.ui.display(each.position(at)) for card, each in zip(cards, tweens)]
             _callback(after_callback)
 
             pygame.display.update()
-            clock.tick(FPS)
+            frame_drawn()
+            if not finished:
+                get_clock().tick(FPS)
         return last_sprite_rects
 
 
 class PlayerUI:
 
-    def __init__(self, player, screen, board, orientation, hide=False):
+    def __init__(self, player, screen, board, orientation, hide=False, hand_size=13):
         player.ui = self
 
         self.player = player
@@ -457,6 +510,7 @@ class PlayerUI:
         self.board = board
         self.orientation = orientation
         self.hide = hide
+        self.hand_size = hand_size
 
         self.dirty_rects = []  # set by unfold_cards()
         self.rect = None  # set by unfold_cards(), union rect of this players card
@@ -466,8 +520,7 @@ class PlayerUI:
         self.throw_position = None
         self.name_position = None
 
-        font = pygame.font.SysFont("monospace", 18)
-        self.name = font.render(self.player.name, 1, (0, 0, 0))
+        self.name = render_text(self.player.name)
 
         self.hidden_card_rect = load_image(get_back_image()).get_rect()  # used for its dimension
         self.visible_card_rect = load_image(get_card_image()).get_rect()  # used for its dimension
@@ -489,7 +542,7 @@ class PlayerUI:
 
         self.cards_v_spacing = 15 if self.hide else 30
         self.cards_h_spacing = 20 if self.hide else min(60,
-            (self.board[0] - 2*padding - self.card_rect.width)/(13 - 1))
+            (self.board[0] - 2*padding - self.card_rect.width)/max(self.hand_size - 1, 1))
 
         if self.orientation == 'left':
             position = padding, (self.board[1] - self.visible_card_rect.height - self.card_rect.height)/2
@@ -512,6 +565,9 @@ class PlayerUI:
             name_position = position[0], self.board[1]-20
         else:
             raise Exception("Orientation %r is not supported." % self.orientation)
+        if self.orientation in ('left', 'right'):
+            # big hands are squeezed to stay on the board
+            self.cards_v_spacing = min(self.cards_v_spacing, 2 * position[1] / max(self.hand_size - 1, 1))
         self.corner_position = position
         self.throw_position = throw_position
         self.name_position = name_position
@@ -531,7 +587,7 @@ class PlayerUI:
         after_callback.append(lambda: self.redraw(_from=card.index))
 
         # redraw all thrown cards to prevent loss of some pixels due to overlapping betn cards
-        before_callback.append(lambda: [card.ui.redraw() for card in turn.cards])
+        before_callback.append(lambda: [each.ui.redraw() for each in turn.cards if each is not card])
 
         card.ui.show()
         card.ui.move(self.throw_position, before_callback, after_callback, delay=0.1)
@@ -551,7 +607,7 @@ class PlayerUI:
         """
         # find positive value for to
         if to < 0:
-           to += 13
+           to += self.hand_size
         for card in self.player.all_cards:
             if _from <= card.index <= to:
                 card.ui.redraw()
@@ -566,7 +622,7 @@ class PlayerUI:
         else:
             x = self.corner_position[0]
             y = self.corner_position[1] - (total_cards - 1) / 2 * self.cards_v_spacing
-            name = pygame.transform.rotate(self.name, 90)
+            name = render_text(self.player.name, rotation=90)
 
         self.screen.fill(WHITE, make_rect(name, self.name_position))
         self.screen.blit(name, self.name_position)
@@ -593,9 +649,37 @@ class PlayerUI:
 
 
 
+class ScoreBoard:
+    """Score labels of the players, rendered again only when a score changes"""
+    def __init__(self, screen, positions):
+        self.screen = screen
+        self.positions = positions
+        self.scores = [None] * len(positions)
+        self.labels = [None] * len(positions)
+
+    def update(self, scores):
+        dirty_rects = []
+        for i, score in enumerate(scores):
+            if score == self.scores[i]:
+                continue
+            position = self.positions[i]
+            if self.labels[i] is not None:
+                dirty_rects.append(self.screen.fill(WHITE, make_rect(self.labels[i], position)))
+            self.scores[i] = score
+            self.labels[i] = render_text("Score:{0}".format(score))
+            dirty_rects.append(self.screen.blit(self.labels[i], position))
+        return dirty_rects
+
+    def draw(self):
+        for label, position in zip(self.labels, self.positions):
+            if label is not None:
+                self.screen.blit(label, position)
+
+
 class CallBreakUI:
     # import ipdb; ipdb.set_trace();
-    def __init__(self):
+    def __init__(self, depth=0):
+        """`depth` 32 forces 32-bit colour, e.g. on SDL's 8-bit dummy driver"""
         pygame.init()
         self.score = 0
         if android:
@@ -607,8 +691,7 @@ class CallBreakUI:
 
         pygame.display.set_caption('CallBreak')
         self.board = self.resolution[0], self.resolution[1]
-        pygame.time.set_timer(pygame.USEREVENT, int(1000 / FPS))
-        self.screen = pygame.display.set_mode(self.resolution)
+        self.screen = pygame.display.set_mode(self.resolution, 0, depth)
         self.screen.fill(WHITE)
 #        icon = load_image("icon.png")
 #        pygame.display.set_icon(icon)
@@ -620,7 +703,6 @@ class CallBreakUI:
 
         screen = pygame.display.set_mode((960, 540))
 
-        font = pygame.font.SysFont("monospace", 18)
         gui = pgui.App()
 
         def btncall():
@@ -663,10 +745,13 @@ class CallBreakUI:
         player3_ui = PlayerUI(player3, self.screen, self.board, 'right', hide=True)
         player4_ui = PlayerUI(player4, self.screen, self.board, 'bottom', hide=False)
 
+        player4.controller = HumanController()
+
         players = [player1_ui, player2_ui, player3_ui, player4_ui]
-        game = CallBreak([ui.player for ui in players])
+        game = CallBreak([ui.player for ui in players], [GameUI()])
 
         score = 0
+        scoreboard = ScoreBoard(screen, [(20, 20), (238, 20), (855, 20), (20, 380)])
         while True:
             
             for event in pygame.event.get():
@@ -679,15 +764,8 @@ class CallBreakUI:
             self.screen.fill(WHITE)
                      
             pygame.display.update() 
-            scoretext1 = font.render("Score:{0}".format(score), 1, (0,0,0))
-            scoretext2 = font.render("Score:{0}".format(score), 1, (0,0,0))
-            scoretext3 = font.render("Score:{0}".format(score), 1, (0,0,0))
-            scoretext4 = font.render("Score:{0}".format(score), 1, (0,0,0))
-
-            screen.blit(scoretext1, (20, 20))
-            screen.blit(scoretext2, (238, 20))
-            screen.blit(scoretext3, (855, 20))
-            screen.blit(scoretext4, (20, 380))
+            scoreboard.update([score] * len(players))
+            scoreboard.draw()
             game.ready()
             for player in players:
                 player.ready()
@@ -695,26 +773,28 @@ class CallBreakUI:
             
             user_call = False
            
+            gui.paint(screen)
+            pygame.display.flip()
             while not user_call: 
 
-                for event in pygame.event.get():
-                    if event.type == QUIT:
-                        pygame.quit()
-                        sys.exit()
-                    elif event.type == KEYDOWN and event.key == K_ESCAPE:
-                        return
-                    
-                    gui.event(event)
-                    gui.paint(screen)
-                    pygame.display.flip()
-                    edText = set_call()
-                    call = font.render("{0}".format(edText), 1, (1,1,1))
-
-                    if set_call():
-                        user_call = True 
-                        screen.blit(call, (400, 358))
-                        pygame.display.update()                        
-                        pygame.display.flip()
+                event = wait_for_event()
+                if event.type == QUIT:
+                    pygame.quit()
+                    sys.exit()
+                elif event.type == KEYDOWN and event.key == K_ESCAPE:
+                    return
+
+                gui.event(event)
+                # repaint only the widgets the event changed
+                dirty_rects = gui.update(screen) or []
+                edText = set_call()
+
+                if edText:
+                    user_call = True 
+                    call = render_text("{0}".format(edText), (1,1,1))
+                    dirty_rects.append(screen.blit(call, (400, 358)))
+                if dirty_rects:
+                    pygame.display.update(dirty_rects)
 
             pygame.display.update()   
             game.start()
@@ -5,6 +5,11 @@
 
 
 
+import collections
+import inspect
+import time
+from weakref import WeakKeyDictionary
+
 def Debug(msg, _type='Message'):
     print '     %s: %s' % (_type, msg)
 
@@ -63,36 +68,66 @@ class EventManager:
     """
     This object is responsible for coordinating most communication between the
     Model, View, and Controller.
+
+    Posted events are queued and delivered by Drain, once per frame, only to
+    the listeners subscribed to their class (or one of its bases).
     """
-    def __init__(self):
-        from weakref import WeakKeyDictionary
-        self.listeners = WeakKeyDictionary()
-        self.eventQueue = []
+    def __init__(self, debug=False):
+        # event class -> listeners, held weakly
+        self.subscribers = {}
+        self.eventQueue = collections.deque()
+        self.debug = debug
+        self._eventTypes = {}
 
     #----------------------------------------------------------------------
-    def RegisterListener(self, listener):
-        self.listeners[listener] = 1
+    def RegisterListener(self, listener, eventTypes=(Event,)):
+        for eventType in eventTypes:
+            self.subscribers.setdefault(eventType, WeakKeyDictionary())[listener] = 1
 
     #----------------------------------------------------------------------
     def UnregisterListener(self, listener):
-        if listener in self.listeners.keys():
-            del self.listeners[listener]
+        for listeners in self.subscribers.values():
+            if listener in listeners:
+                del listeners[listener]
         
     #----------------------------------------------------------------------
     def Post(self, event):
-        if not isinstance(event, TickEvent):
+        self.eventQueue.append(event)
+
+    #----------------------------------------------------------------------
+    def Drain(self):
+        """Delivers the queued events, including those posted meanwhile"""
+        while self.eventQueue:
+            self.Dispatch(self.eventQueue.popleft())
+
+    #----------------------------------------------------------------------
+    def Dispatch(self, event):
+        if self.debug and not isinstance(event, TickEvent):
             Debug(event.name)
-        for listener in self.listeners.keys():
+
+        eventClass = event.__class__
+        eventTypes = self._eventTypes.get(eventClass)
+        if eventTypes is None:
+            eventTypes = self._eventTypes[eventClass] = inspect.getmro(eventClass)
+
+        notified = set()
+        for eventType in eventTypes:
+            listeners = self.subscribers.get(eventType)
+            if not listeners:
+                continue
             # NOTE: If the weakref has died, it will be automatically
             #       removed, so we do not need to worry about it.
-            listener.Notify(event)
+            for listener in listeners.keys():
+                if listener not in notified:
+                    notified.add(listener)
+                    listener.Notify(event)
 
 #------------------------------------------------------------------------------
 class KeyboardController:
     """..."""
     def __init__(self, evManager):
         self.evManager = evManager
-        self.evManager.RegisterListener(self)
+        self.evManager.RegisterListener(self, [TickEvent])
 
     #----------------------------------------------------------------------
     def Notify(self, event):
@@ -123,18 +158,30 @@ class KeyboardController:
 
 #------------------------------------------------------------------------------
 class CPUSpinnerController:
-    """..."""
-    def __init__(self, evManager):
+    """Posts a TickEvent and drains the event queue `fps` times a second"""
+    def __init__(self, evManager, fps=30):
         self.evManager = evManager
-        self.evManager.RegisterListener(self)
+        self.evManager.RegisterListener(self, [QuitEvent])
 
         self.keepGoing = 1
+        self.fps = fps
 
     #----------------------------------------------------------------------
     def Run(self):
+        frame = 1.0 / self.fps
+        nextTick = time.time()
         while self.keepGoing:
             event = TickEvent()
             self.evManager.Post(event)
+            self.evManager.Drain()
+
+            nextTick += frame
+            delay = nextTick - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # running late, do not try to catch up with a burst of ticks
+                nextTick = time.time()
 
     #----------------------------------------------------------------------
     def Notify(self, event):
@@ -181,7 +228,8 @@ class PygameView:
     """..."""
     def __init__(self, evManager):
         self.evManager = evManager
-        self.evManager.RegisterListener(self)
+        self.evManager.RegisterListener(self, [TickEvent, MapBuiltEvent,
+                                               CharactorPlaceEvent, CharactorMoveEvent])
 
         pygame.init()
         self.window = pygame.display.set_mode((428, 428))
@@ -278,7 +326,7 @@ class Game:
     #----------------------------------------------------------------------
     def __init__(self, evManager):
         self.evManager = evManager
-        self.evManager.RegisterListener(self)
+        self.evManager.RegisterListener(self, [TickEvent])
 
         self.state = Game.STATE_PREPARING
         
@@ -312,7 +360,7 @@ class Charactor:
     """..."""
     def __init__(self, evManager):
         self.evManager = evManager
-        self.evManager.RegisterListener(self)
+        self.evManager.RegisterListener(self, [GameStartedEvent, CharactorMoveRequest])
         self.sector = None
 
     #----------------------------------------------------------------------
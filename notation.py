@@ -0,0 +1,130 @@
+"""
+Text notation of cards, hands and deals.
+
+A card is a face and a suit letter, "AS", "10H" or "TH", "7c"; a hand is
+cards separated by spaces. A deal follows PBN: the seat of the first hand
+then the four hands clockwise, each as spade.heart.diamond.club holdings,
+
+    N:AKQ2.J93.T8.7654 J43.AT2.9752.K32 ...
+
+Seats N, E, S and W are 0 to 3. Everything is read and written through
+tables built once, indexed by token or by Card.id.
+"""
+from callbreak_card import Faces, Suits, hand_from_ids, hand_ids, make_card_from_id
+
+SUIT_LETTERS = 'SHCD'  # by Suit.order
+PBN_SUITS = [0, 1, 3, 2]  # suit orders in PBN holding order: S, H, D, C
+SEATS = 'NESW'
+
+CARD_IDS = {}
+CARD_TEXT = [None] * 52
+PBN_FACES = [None] * 52
+PBN_FACE_VALUES = {}
+for _suit in Suits:
+    for _face in Faces:
+        _id = _suit.order * 13 + _face.value - 2
+        _letter = SUIT_LETTERS[_suit.order]
+        _pbn = 'T' if _face.value == 10 else _face.name
+        CARD_TEXT[_id] = _face.name + _letter
+        PBN_FACES[_id] = _pbn
+        PBN_FACE_VALUES[_pbn] = _face.value
+        for _name in set([_face.name, _pbn]):
+            for _token in (_name + _letter, _name.lower() + _letter.lower(),
+                           _name + _letter.lower(), _name.lower() + _letter):
+                CARD_IDS[_token] = _id
+del _suit, _face, _id, _letter, _pbn, _name, _token
+
+
+def parse_card_id(token):
+    try:
+        return CARD_IDS[token]
+    except KeyError:
+        raise ValueError('Not a card: %r' % token)
+
+
+def parse_card(token):
+    return make_card_from_id(parse_card_id(token))
+
+
+def parse_ids(text):
+    """card ids of a space separated hand, in the order written"""
+    try:
+        return [CARD_IDS[token] for token in text.split()]
+    except KeyError as e:
+        raise ValueError('Not a card: %r' % e.args[0])
+
+
+def parse_hand(text):
+    """arranged Hand of a space separated hand"""
+    return hand_from_ids(parse_ids(text))
+
+
+def format_hand(hand):
+    """text of a list of card ids or a Hand / Player.cards"""
+    return ' '.join([CARD_TEXT[card_id] for card_id in hand_ids(hand)])
+
+
+def _parse_holdings(text):
+    holdings = text.split('.')
+    if len(holdings) != 4:
+        raise ValueError('A PBN hand has four holdings: %r' % text)
+    ids = []
+    for order, holding in zip(PBN_SUITS, holdings):
+        for face in holding.upper():
+            try:
+                ids.append(order * 13 + PBN_FACE_VALUES[face] - 2)
+            except KeyError:
+                raise ValueError('Not a face: %r in %r' % (face, text))
+    return ids
+
+
+def parse_deal(text):
+    """card ids of the four hands of a PBN deal, by seat N, E, S, W"""
+    first = 0
+    if text[1:2] == ':':
+        first = SEATS.index(text[0].upper())
+        text = text[2:]
+    hands = text.split()
+    if len(hands) != len(SEATS):
+        raise ValueError('A deal has %d hands: %r' % (len(SEATS), text))
+    deal = [None] * len(SEATS)
+    for i, hand in enumerate(hands):
+        deal[(first + i) % len(SEATS)] = _parse_holdings(hand)
+    return deal
+
+
+def format_deal(hands, first=0):
+    """PBN deal of hands by seat, written from seat `first`"""
+    written = []
+    for i in xrange(len(SEATS)):
+        ids = sorted(hand_ids(hands[(first + i) % len(SEATS)]), reverse=True)
+        holdings = [''.join([PBN_FACES[card_id] for card_id in ids if card_id // 13 == order])
+                    for order in PBN_SUITS]
+        written.append('.'.join(holdings))
+    return '%s:%s' % (SEATS[first], ' '.join(written))
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    from callbreak_card import Deck
+
+    deck = Deck()
+    random.shuffle(deck.cards)
+    hands = [[card.id for card in deck.cards[seat::4]] for seat in xrange(4)]
+    deal = format_deal(hands)
+    print deal
+    assert [sorted(hand) for hand in parse_deal(deal)] == [sorted(hand) for hand in hands]
+    print parse_hand(format_hand(hands[0]))
+
+    count = 100000
+    start = time.time()
+    for i in xrange(count):
+        parse_deal(deal)
+    print 'parse_deal  %.2f us' % ((time.time() - start) / count * 1e6)
+    text = format_hand(hands[0])
+    start = time.time()
+    for i in xrange(count):
+        parse_ids(text)
+    print 'parse_ids   %.2f us' % ((time.time() - start) / count * 1e6)
@@ -1,5 +1,15 @@
 from __future__ import division
+from collections import namedtuple
+import math
 import random
+import time
+
+from cache import lru_cache
+
+# ess: effective sample size, the plain samples giving the same precision
+Estimate = namedtuple('Estimate', ('value', 'low', 'high', 'samples', 'ess'))
+
+Z_SCORES = {0.9: 1.6449, 0.95: 1.96, 0.99: 2.5758}
 
 def get_spade_distribution(cards_count, players_count, random_gen, _extra=False):
     counts = []
@@ -26,6 +36,37 @@ def contains_max(dist, count):
 def get_prob(generator, predicate, repeat=1000, count=3):
     return min(sum(predicate(generator()) for i in xrange(repeat))/repeat*100 for j in xrange(count))/100
 
+def wilson_interval(successes, samples, z=1.96):
+    if not samples:
+        return 0.0, 1.0
+    p = successes / samples
+    z2 = z * z
+    center = (p + z2 / (2 * samples)) / (1 + z2 / samples)
+    half = z * math.sqrt(p * (1 - p) / samples + z2 / (4 * samples * samples)) / (1 + z2 / samples)
+    return max(0.0, center - half), min(1.0, center + half)
+
+def estimate_prob(generator, predicate, width=0.02, confidence=0.95, batch=100,
+                  max_samples=100000, max_time=None):
+    """
+    Samples in batches until the confidence interval of the probability is
+    narrower than `width`, or `max_samples` or `max_time` seconds are used up.
+    Unlike get_prob the estimate is unbiased and comes with its interval.
+    """
+    z = Z_SCORES[confidence]
+    deadline = None if max_time is None else time.time() + max_time
+    successes = samples = 0
+    low, high = 0.0, 1.0
+    while samples < max_samples:
+        for i in xrange(min(batch, max_samples - samples)):
+            successes += bool(predicate(generator()))
+        samples += min(batch, max_samples - samples)
+        low, high = wilson_interval(successes, samples, z)
+        if high - low <= width:
+            break
+        if deadline is not None and time.time() >= deadline:
+            break
+    return Estimate(successes / samples if samples else 0.0, low, high, samples, samples)
+
 def shuffle(cards):
     return random.shuffle(cards)
     # sattoloCycle
@@ -35,17 +76,286 @@ def shuffle(cards):
         j = randrange(i)  # 0 <= j <= i-1
         cards[j], cards[i] = cards[i], cards[j]
 
+def choose(n, k):
+    if k < 0 or k > n:
+        return 0
+    k = min(k, n - k)
+    result = 1
+    for i in xrange(k):
+        result = result * (n - i) // (i + 1)
+    return result
+
+_exact_distributions = {}
+
+def get_exact_distribution(cards_count, players_count, hand_size=13):
+    """
+    Every way `cards_count` cards of a suit can lie in `players_count` unseen
+    hands of `hand_size` cards, with its exact probability
+    """
+    key = cards_count, players_count, hand_size
+    if key in _exact_distributions:
+        return _exact_distributions[key]
+
+    def splits(remaining, players):
+        if players == 1:
+            if remaining <= hand_size:
+                yield (remaining,)
+            return
+        for count in xrange(min(remaining, hand_size) + 1):
+            for rest in splits(remaining - count, players - 1):
+                yield (count,) + rest
+
+    total = choose(players_count * hand_size, cards_count)
+    distributions = []
+    for dist in splits(cards_count, players_count):
+        ways = 1
+        for count in dist:
+            ways *= choose(hand_size, count)
+        distributions.append((dist, ways / total))
+
+    _exact_distributions[key] = distributions
+    return distributions
+
+@lru_cache(maxsize=1024)
+def get_min_count_probabilities(cards_count, players_count, hand_size=13, undealt=0):
+    """
+    Probability that every one of `players_count` unseen hands of
+    `hand_size` cards holds at least `m` of `cards_count` cards of a suit,
+    indexed by `m`, the other unseen cards being `undealt`. Counted hand by
+    hand, so it stays cheap for many players.
+    """
+    total = choose(players_count * hand_size + undealt, cards_count)
+    probabilities = []
+    for least in xrange(cards_count // players_count + 1):
+        # ways[c]: ways for the hands so far to hold c cards, each at least `least`
+        ways = [1] + [0] * cards_count
+        for player in xrange(players_count):
+            ways = [sum(choose(hand_size, n) * ways[c - n] for n in xrange(least, min(c, hand_size) + 1))
+                    for c in xrange(cards_count + 1)]
+        # the undealt cards hold the rest, any number of them
+        ways = [sum(choose(undealt, n) * ways[c - n] for n in xrange(min(c, undealt) + 1))
+                for c in xrange(cards_count + 1)]
+        probabilities.append(ways[cards_count] / total)
+    return probabilities
+
+def _splits(cards_count, capacity, void_pattern=0, players=None):
+    """
+    Ways to split `cards_count` cards among hands with room for `capacity`,
+    none going to hands whose bit is set in `void_pattern`, each with the
+    number of ways to pick which cards go where
+    """
+    if players is None:
+        players = len(capacity)
+    if players == 0:
+        if cards_count == 0:
+            yield (), 1
+        return
+    seat = len(capacity) - players
+    most = 0 if void_pattern >> seat & 1 else min(cards_count, capacity[seat])
+    for count in xrange(most + 1):
+        for rest, ways in _splits(cards_count - count, capacity, void_pattern, players - 1):
+            yield (count,) + rest, ways * choose(cards_count, count)
+
+def _distribution_key(suit, suit_counts, hand_sizes, voids):
+    if voids is None:
+        voids = [()] * len(hand_sizes)
+    # bit per hand void in the suit
+    patterns = [sum(1 << seat for seat, void in enumerate(voids) if order in void)
+                for order in xrange(len(suit_counts))]
+    # the other suits only matter through their size and voids
+    others = tuple(sorted((suit_counts[order], patterns[order])
+                          for order in xrange(len(suit_counts)) if order != suit))
+    return suit_counts[suit], patterns[suit], tuple(hand_sizes), others
+
+def get_suit_length_distribution(suit, suit_counts, hand_sizes, voids=None):
+    """
+    Exact joint distribution of the lengths of `suit` across the unseen
+    hands, as [(lengths, probability)]. `suit_counts` are the unseen cards
+    of every suit (by Suit.order), `hand_sizes` the unseen cards of every
+    hand and `voids` the suits each hand is known to be void in.
+    """
+    return _suit_length_distribution(*_distribution_key(suit, suit_counts, hand_sizes, voids))
+
+@lru_cache(maxsize=4096)
+def _suit_length_distribution(cards_count, void_pattern, hand_sizes, others):
+    deals = {}
+
+    def ways(index, capacity):
+        # deals of others[index:] filling `capacity` exactly
+        if index == len(others):
+            return 0 if any(capacity) else 1
+        key = index, capacity
+        if key not in deals:
+            count, pattern = others[index]
+            total = 0
+            for split, split_ways in _splits(count, capacity, pattern):
+                total += split_ways * ways(index + 1, tuple(c - n for c, n in zip(capacity, split)))
+            deals[key] = total
+        return deals[key]
+
+    weighted = []
+    for split, split_ways in _splits(cards_count, hand_sizes, void_pattern):
+        weight = split_ways * ways(0, tuple(c - n for c, n in zip(hand_sizes, split)))
+        if weight:
+            weighted.append((split, weight))
+    total = sum(weight for split, weight in weighted)
+    if not total:
+        raise ValueError('No deal is consistent with the given voids and hand sizes.')
+    return [(split, weight / total) for split, weight in weighted]
+
+@lru_cache(maxsize=4096)
+def _void_probability(seat, distribution_key):
+    return sum(p for split, p in _suit_length_distribution(*distribution_key) if not split[seat])
+
+def get_void_probability(suit, seat, suit_counts, hand_sizes, voids=None):
+    """Probability that unseen hand `seat` holds no card of `suit`"""
+    return _void_probability(seat, _distribution_key(suit, suit_counts, hand_sizes, voids))
+
 def get_heart_distribution(cards_count, players_count):
     cards = [1]*cards_count + [0]*(cards_count*(players_count-1))
     shuffle(cards)
     cards_distribution = [cards[i*cards_count:(i+1)*cards_count] for i in xrange(players_count)]
     return map(sum, cards_distribution)
 
+def _estimate(value, variance, samples, z):
+    """Estimate with a normal interval, `variance` being that of `value`"""
+    half = z * math.sqrt(variance)
+    if variance > 0:
+        ess = value * (1 - value) / variance
+    else:
+        ess = samples
+    return Estimate(value, max(0.0, value - half), min(1.0, value + half), samples, ess)
+
+def stratified_prob(strata, predicate, repeat=1000, confidence=0.95):
+    """
+    `strata` is a list of (probability, generator) covering every outcome;
+    each stratum gets its share of the samples and the results are weighted
+    back together
+    """
+    value = variance = 0
+    samples = 0
+    for weight, generator in strata:
+        if not weight:
+            continue
+        n = max(2, int(round(weight * repeat)))
+        p = sum(bool(predicate(generator())) for i in xrange(n)) / n
+        value += weight * p
+        variance += weight * weight * p * (1 - p) / n
+        samples += n
+    return _estimate(value, variance, samples, Z_SCORES[confidence])
+
+def antithetic_prob(generator, predicate, dimensions, repeat=1000, confidence=0.95):
+    """
+    `generator` maps `dimensions` uniforms to a sample, monotonically for
+    the pairs to be useful; every draw is paired with its mirror image 1 - u
+    """
+    pairs = max(2, repeat // 2)
+    means = []
+    for i in xrange(pairs):
+        uniforms = [random.random() for j in xrange(dimensions)]
+        mirrored = [1 - u for u in uniforms]
+        means.append((bool(predicate(generator(uniforms))) + bool(predicate(generator(mirrored)))) / 2)
+    value = sum(means) / pairs
+    variance = sum((m - value) ** 2 for m in means) / (pairs - 1) / pairs
+    return _estimate(value, variance, 2 * pairs, Z_SCORES[confidence])
+
+def importance_prob(proposal, predicate, repeat=1000, confidence=0.95):
+    """
+    `proposal` returns (sample, weight), the weight being the likelihood
+    ratio of the sample under the real and the proposal distribution; useful
+    when the proposal makes a rare event common
+    """
+    total = total_squares = 0
+    for i in xrange(repeat):
+        sample, weight = proposal()
+        if predicate(sample):
+            total += weight
+            total_squares += weight * weight
+    value = total / repeat
+    variance = max(0.0, total_squares / repeat - value * value) / repeat
+    return _estimate(min(1.0, value), variance, repeat, Z_SCORES[confidence])
+
+def get_suit_strata(cards_count, players_count, hand_size=13):
+    """
+    Strata for stratified_prob over the split of a suit, by the number of
+    its cards held by the first player
+    """
+    strata = {}
+    for dist, p in get_exact_distribution(cards_count, players_count, hand_size):
+        strata[dist[0]] = strata.get(dist[0], 0) + p
+
+    def stratum(first):
+        def generator():
+            rest = cards_count - first
+            cards = [1]*rest + [0]*(hand_size*(players_count-1) - rest)
+            shuffle(cards)
+            return [first] + [sum(cards[i*hand_size:(i+1)*hand_size]) for i in xrange(players_count-1)]
+        return generator
+
+    return [(p, stratum(first)) for first, p in sorted(strata.items())]
+
+def get_sequential_distribution(uniforms, cards_count, players_count, hand_size=13):
+    """
+    Split of a suit drawn player by player through the inverse CDF of the
+    hypergeometric law, one uniform per player but the last, for
+    antithetic_prob
+    """
+    dist = []
+    remaining = cards_count
+    unseen = players_count * hand_size
+    for u in uniforms[:players_count-1]:
+        total = choose(unseen, remaining)
+        count = 0
+        cumulative = choose(unseen - hand_size, remaining) / total
+        while cumulative < u and count < min(remaining, hand_size):
+            count += 1
+            cumulative += choose(hand_size, count) * choose(unseen - hand_size, remaining - count) / total
+        dist.append(count)
+        remaining -= count
+        unseen -= hand_size
+    dist.append(remaining)
+    return dist
+
+def get_tilted_distribution(cards_count, players_count, hand_size=13, tilt=0.5):
+    """
+    Deals the cards of a suit one at a time, favouring players holding fewer
+    of them by a factor exp(-tilt) per card, so that even splits become
+    common. Returns the split and its likelihood ratio for importance_prob.
+    """
+    counts = [0] * players_count
+    weight = 1.0
+    for card in xrange(cards_count):
+        free = [hand_size - count for count in counts]
+        total_free = sum(free)
+        bias = [f * math.exp(-tilt * count) for f, count in zip(free, counts)]
+        total_bias = sum(bias)
+        pick = random.random() * total_bias
+        cumulative = 0.0
+        for player, b in enumerate(bias):
+            cumulative += b
+            if b and pick < cumulative:
+                break
+        else:
+            # rounding left `pick` past the sum: the last player with room
+            player = max(i for i, b in enumerate(bias) if b)
+            b = bias[player]
+        weight *= (free[player] / total_free) / (b / total_bias)
+        counts[player] += 1
+    return counts, weight
+
 def main():
 #    generator = lambda: get_spade_distribution(10, 3, random.triangular, _extra=True)
     generator = lambda: get_heart_distribution(13-5, 3)
     predicate = lambda dist: contains_min(dist, 15-13)
     print get_prob(generator, predicate)
+    print estimate_prob(generator, predicate)
+
+    # rare event: every opponent holds at least 4 of the 12 remaining cards
+    predicate = lambda dist: contains_min(dist, 4)
+    print stratified_prob(get_suit_strata(12, 3), predicate)
+    print antithetic_prob(lambda u: get_sequential_distribution(u, 12, 3), predicate, 2)
+    print importance_prob(lambda: get_tilted_distribution(12, 3), predicate)
+    print sum(p for dist, p in get_exact_distribution(12, 3) if predicate(dist))
 
 
 if __name__ == '__main__':
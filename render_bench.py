@@ -0,0 +1,123 @@
+"""
+Renders recorded or simulated games headless, on SDL's dummy video driver,
+as fast as possible and reports the frame rate and the cost of a frame.
+
+    python render_bench.py [--games N] [--records FILE] [--frames DIR]
+
+Records are simulate.play_game dicts, one JSON object per line. With
+--frames every frame is also saved as a PNG in DIR (saving is not counted
+in the draw cost).
+"""
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import argparse
+import json
+import time
+
+import pygame
+
+import main as ui
+import simulate
+import tween
+
+ORIENTATIONS = [('left', True), ('top', True), ('right', True), ('bottom', False)]
+
+
+class FrameClock:
+    """
+    Stands in for pygame's Clock: instead of waiting for the next frame it
+    moves a simulated time one frame ahead, so animations draw their usual
+    number of frames at full speed, and it measures every frame drawn.
+    """
+    def __init__(self, screen, frames_dir=None):
+        self.screen = screen
+        self.frames_dir = frames_dir
+        self.time = 0.0
+        self.frames = 0
+        self.draw_time = 0.0
+        self.worst = 0.0
+        self.last = time.time()
+
+    def now(self):
+        return self.time
+
+    def restart(self):
+        self.last = time.time()
+
+    def frame_drawn(self):
+        cost = time.time() - self.last
+        self.frames += 1
+        self.draw_time += cost
+        self.worst = max(self.worst, cost)
+        if self.frames_dir:
+            pygame.image.save(self.screen, os.path.join(self.frames_dir, 'frame-%06d.png' % self.frames))
+        self.last = time.time()
+
+    def tick(self, fps):
+        self.time += 1.0 / fps
+        self.last = time.time()
+        return int(1000.0 / fps)
+
+
+def render_game(cb_ui, record, clock):
+    if len(record['hands']) > len(ORIENTATIONS):
+        raise ValueError('Games of %d players cannot be rendered, the table has %d seats.' % (
+            len(record['hands']), len(ORIENTATIONS)))
+    game = simulate.replay_game(record, [ui.GameUI(pause=0)])
+    cb_ui.screen.fill(ui.WHITE)
+    for player, (orientation, hide) in zip(game.players, ORIENTATIONS):
+        playerui = ui.PlayerUI(player, cb_ui.screen, cb_ui.board, orientation, hide=hide,
+                               hand_size=game.hand_size)
+        playerui.ready()
+        playerui.unfold_cards()
+    clock.restart()
+    game.start()
+
+
+def render_games(records, frames_dir=None):
+    """renders the records and returns the FrameClock holding the measures"""
+    if frames_dir and not os.path.isdir(frames_dir):
+        os.makedirs(frames_dir)
+
+    # the dummy driver defaults to an 8-bit palette, which card images do not survive
+    cb_ui = ui.CallBreakUI(depth=32)
+    clock = FrameClock(cb_ui.screen, frames_dir)
+    ui.set_clock(clock)
+    tween.set_time_source(clock.now)
+    for record in records:
+        render_game(cb_ui, record, clock)
+    return clock
+
+
+def read_records(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--games', type=int, default=10, help='simulated games to render')
+    parser.add_argument('--records', help='JSON lines file of game records to render instead')
+    parser.add_argument('--frames', help='directory to save every frame in')
+    args = parser.parse_args()
+
+    if args.records:
+        records = read_records(args.records)
+    else:
+        records = (simulate.play_game(seed) for seed in xrange(args.games))
+
+    start = time.time()
+    clock = render_games(records, args.frames)
+    elapsed = time.time() - start
+    print 'frames         %d' % clock.frames
+    print 'wall time      %.2f s' % elapsed
+    print 'frames/sec     %.1f' % (clock.frames / elapsed)
+    print 'draw per frame %.2f ms (worst %.2f ms)' % (
+        clock.draw_time / max(clock.frames, 1) * 1000, clock.worst * 1000)
+
+
+if __name__ == '__main__':
+    main()
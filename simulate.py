@@ -0,0 +1,106 @@
+"""
+Headless games between bots, recorded as plain data.
+
+A game record is a dict of card ids (see Card.id) and seat numbers:
+
+    seed         seed the deal was shuffled with
+    hands        cards of each seat after the deal
+    calls        call of each seat
+    tricks       (leader seat, cards in playing order) for each trick
+    won          tricks won by each seat
+    scores       score of each seat
+    bots         class name of each seat's player
+    no_of_decks  decks dealt from
+"""
+import random
+
+from callbreak_card import CallBreak, Player, get_score
+import call
+
+
+class ReplayPlayer(Player):
+    """Bot playing the cards of a recorded game, in order"""
+    def __init__(self, name, script=()):
+        Player.__init__(self, name, is_bot=True)
+        self.script = list(script)
+
+    def think_to_play(self, turn, legal_cards, has_greater_card):
+        card_id = self.script.pop(0)
+        for card in legal_cards:
+            if card.id == card_id:
+                return card
+        raise Exception('%s cannot play recorded card %d here.' % (self.name, card_id))
+
+
+def make_players(count=4):
+    return [Player('Bot%d' % (i + 1)) for i in xrange(count)]
+
+
+def record_game(game, hands, seed=None):
+    players = game.players
+    return {
+        'seed': seed,
+        'hands': hands,
+        'calls': [player.call for player in players],
+        'tricks': [(turn.starter.turn, [card.id for card in turn.cards]) for turn in game.turns],
+        'won': [player.won for player in players],
+        'scores': [get_score(player.call, player.won) for player in players],
+        'bots': [player.__class__.__name__ for player in players],
+        'no_of_decks': game.deck.no_of_decks,
+    }
+
+
+def make_calls(game):
+    """
+    calls of the bots of a dealt game, maximizing their expected scores
+    unless they make their own (see bots.HeuristicBot)
+    """
+    for player in game.players:
+        if hasattr(player, 'make_call'):
+            player.make_call(game)
+            continue
+        player.call = call.optimize_call(player.cards, suit_size=13 * game.deck.no_of_decks,
+                                         other_players_count=len(game.players) - 1,
+                                         hand_size=game.hand_size).call
+
+
+def play_game(seed=None, players=None, no_of_decks=1):
+    if players is None:
+        players = make_players()
+    random.seed(seed)
+
+    game = CallBreak(players, no_of_decks=no_of_decks)
+    game.ready()
+    hands = [[card.id for card in player.all_cards] for player in players]
+    make_calls(game)
+    game.start()
+    return record_game(game, hands, seed)
+
+
+def replay_game(record, listeners=None, players=None):
+    """
+    Plays a recorded game again, e.g. to render it. The game is returned
+    once it has been dealt, start() plays it.
+    """
+    scripts = [[] for hand in record['hands']]
+    for leader, cards in record['tricks']:
+        for i, card_id in enumerate(cards):
+            scripts[(leader + i) % len(scripts)].append(card_id)
+    if players is None:
+        players = [ReplayPlayer('Bot%d' % (i + 1)) for i in xrange(len(scripts))]
+    for player, script, call_ in zip(players, scripts, record['calls']):
+        player.script = script
+        player.call = call_
+
+    game = CallBreak(players, listeners, no_of_decks=record.get('no_of_decks', 1),
+                     hand_size=len(record['hands'][0]))
+    # copies of a card from several decks are dealt as separate objects
+    by_id = {}
+    for card in game.cards:
+        by_id.setdefault(card.id, []).append(card)
+    game.ready([by_id[hand[i]].pop() for i in xrange(game.hand_size) for hand in record['hands']])
+    return game
+
+
+if __name__ == '__main__':
+    print play_game(0)
@@ -0,0 +1,51 @@
+"""
+Measures how long the headless modules take to import in a fresh
+interpreter and checks that none of them pulls in pygame.
+
+    python startup.py [budget in ms]
+
+Exits with an error when a module loads pygame or goes over the budget, so
+it can be run next to the other checks to keep startup fast.
+"""
+import subprocess
+import sys
+
+CORE_MODULES = ['callbreak_card', 'probab', 'call', 'simulate', 'tracker', 'endgame']
+
+PROBE = '''
+import sys, time
+start = time.time()
+import %s
+print (time.time() - start) * 1000, 'pygame' in sys.modules
+'''
+
+
+def measure(module, repeat=5):
+    """best import time in ms and whether pygame got loaded"""
+    best = None
+    for i in xrange(repeat):
+        output = subprocess.check_output([sys.executable, '-c', PROBE % module])
+        elapsed, pygame_loaded = output.split()
+        elapsed = float(elapsed)
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, pygame_loaded == 'True'
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 100
+    failed = False
+    for module in CORE_MODULES:
+        elapsed, pygame_loaded = measure(module)
+        status = 'ok'
+        if pygame_loaded:
+            status = 'imports pygame'
+        elif elapsed > budget:
+            status = 'over budget'
+        failed = failed or status != 'ok'
+        print '%-16s %8.2f ms  %s' % (module, elapsed, status)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+Public card tracking for bots.
+
+Cards are bits of a 52-bit mask (see Card.id). The tracker follows the plays
+of a round and keeps the cards still out and, for every seat, the cards it
+may still hold given what the rules forced it to play: failing to follow
+shows a void, and not beating the winning card shows it has nothing higher
+in that suit or in spades.
+"""
+import random
+
+from callbreak_card import GameListener
+import probab
+
+SUIT_SIZE = 13
+SUIT_MASKS = [((1 << SUIT_SIZE) - 1) << (SUIT_SIZE * order) for order in xrange(4)]
+ALL_CARDS = (1 << 52) - 1
+SPADE = 0
+
+
+def card_bit(card):
+    return 1 << card.id
+
+
+def hand_mask(cards):
+    """mask of a list of cards or of per suit lists as in Player.cards"""
+    mask = 0
+    for each in cards:
+        if isinstance(each, list):
+            mask |= hand_mask(each)
+        else:
+            mask |= 1 << each.id
+    return mask
+
+
+def higher_mask(card):
+    """cards of the same suit ranking above `card`"""
+    return SUIT_MASKS[card.suit.order] & ~((2 << card.id) - 1)
+
+
+def card_ids(mask):
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(low.bit_length() - 1)
+        mask ^= low
+    return ids
+
+
+class CardTracker(GameListener):
+    def __init__(self, players_count=4, hand_size=13):
+        self.players_count = players_count
+        self.hand_size = hand_size
+        self.reset()
+
+    def reset(self):
+        self.remaining = ALL_CARDS
+        self.possible = [ALL_CARDS] * self.players_count
+        self.hand_sizes = [self.hand_size] * self.players_count
+        # cards left over when the deck does not deal evenly, never seen
+        self.undealt = 52 - self.players_count * self.hand_size
+
+    def round_started(self, game):
+        if game.deck.no_of_decks > 1:
+            # a mask holds one copy of each card
+            raise ValueError('CardTracker follows single deck games only, not %d decks.'
+                             % game.deck.no_of_decks)
+        self.players_count = len(game.players)
+        self.hand_size = game.hand_size
+        self.reset()
+
+    def card_played(self, turn, card):
+        seat = card.owner.turn
+        bit = card_bit(card)
+        self.remaining &= ~bit
+        self.possible = [possible & ~bit for possible in self.possible]
+        self.hand_sizes[seat] -= 1
+
+        previous = turn.cards[:-1]
+        if not previous:
+            return
+        # not following shows a void in the suit led, whether or not it wins
+        if card.suit.order != turn.suit.order:
+            self.possible[seat] &= ~SUIT_MASKS[turn.suit.order]
+
+        winner = max(previous)
+        if winner < card:
+            return
+
+        # the card did not beat the trick, so a card which would have was not there
+        if card.suit.order != turn.suit.order:
+            if winner.suit.order == SPADE:
+                excluded = higher_mask(winner)
+            else:
+                excluded = SUIT_MASKS[SPADE]
+        elif winner.suit.order == turn.suit.order:
+            excluded = higher_mask(winner)
+        else:
+            excluded = 0
+        self.possible[seat] &= ~excluded
+
+    def is_boss(self, card, hand=None):
+        """True when no unseen card of the same suit ranks above `card`"""
+        outstanding = self.remaining & ~hand_mask(hand or [])
+        return not outstanding & higher_mask(card)
+
+    def is_void(self, seat, suit):
+        return not self.possible[seat] & SUIT_MASKS[suit.order]
+
+    def unseen(self, hand):
+        return self.remaining & ~hand_mask(hand)
+
+    def _unseen_hands(self, seat, hand):
+        unseen = self.unseen(hand)
+        others = [other for other in xrange(self.players_count) if other != seat]
+        suit_counts = [bin(unseen & mask).count('1') for mask in SUIT_MASKS]
+        voids = [[order for order in xrange(4) if not self.possible[other] & SUIT_MASKS[order]]
+                 for other in others]
+        hand_sizes = [self.hand_sizes[other] for other in others]
+        if self.undealt:
+            # the undealt cards as one more hand, void in nothing
+            hand_sizes.append(self.undealt)
+            voids.append([])
+        return others, suit_counts, hand_sizes, voids
+
+    def suit_length_distribution(self, seat, hand, suit):
+        """
+        Exact distribution of the lengths of `suit` in the other hands, as
+        seen by `seat`: the other seats and [(lengths, probability)]
+        """
+        others, suit_counts, hand_sizes, voids = self._unseen_hands(seat, hand)
+        distribution = probab.get_suit_length_distribution(suit.order, suit_counts, hand_sizes, voids)
+        if self.undealt:
+            merged = {}
+            for lengths, p in distribution:
+                merged[lengths[:-1]] = merged.get(lengths[:-1], 0) + p
+            distribution = sorted(merged.items())
+        return others, distribution
+
+    def void_probability(self, seat, hand, other, suit):
+        """Probability, as seen by `seat`, that `other` holds no `suit`"""
+        others, suit_counts, hand_sizes, voids = self._unseen_hands(seat, hand)
+        return probab.get_void_probability(suit.order, others.index(other), suit_counts, hand_sizes, voids)
+
+    def sample_hands(self, seat, hand, rng=random):
+        """
+        Deals the cards unseen by `seat` to the other seats, respecting their
+        hand sizes and the cards each may hold. Returns a mask per seat, the
+        hand of `seat` itself included.
+        """
+        own = hand_mask(hand)
+        others = [other for other in xrange(self.players_count) if other != seat]
+        possible = dict((other, self.possible[other]) for other in others)
+        capacity = dict((other, self.hand_sizes[other]) for other in others)
+        if self.undealt:
+            # the undealt cards go to one more seat, after the real ones
+            pile = self.players_count
+            others.append(pile)
+            possible[pile] = ALL_CARDS
+            capacity[pile] = self.undealt
+
+        # signature: bitset of the seats (by position in `others`) allowed to hold a card
+        signatures = {}
+        cards = []
+        for card_id in card_ids(self.remaining & ~own):
+            signature = 0
+            for i, other in enumerate(others):
+                if possible[other] >> card_id & 1:
+                    signature |= 1 << i
+            cards.append((card_id, signature))
+            signatures[signature] = signatures.get(signature, 0) + 1
+
+        if not self._feasible(signatures, capacity, others):
+            raise ValueError('No deal is consistent with the plays seen so far.')
+
+        # most constrained cards first, random order otherwise
+        rng.shuffle(cards)
+        cards.sort(key=lambda each: bin(each[1]).count('1'))
+
+        hands = [0] * (self.players_count + 1)
+        hands[seat] = own
+        for card_id, signature in cards:
+            signatures[signature] -= 1
+            candidates = [(i, other) for i, other in enumerate(others)
+                          if signature >> i & 1 and capacity[other]]
+            while candidates:
+                total = sum(capacity[other] for i, other in candidates)
+                pick = rng.randrange(total)
+                for i, other in candidates:
+                    pick -= capacity[other]
+                    if pick < 0:
+                        break
+                capacity[other] -= 1
+                if self._feasible(signatures, capacity, others):
+                    hands[other] |= 1 << card_id
+                    break
+                capacity[other] += 1
+                candidates.remove((i, other))
+            else:
+                raise ValueError('No deal is consistent with the plays seen so far.')
+        return hands[:self.players_count]
+
+    @staticmethod
+    def _feasible(signatures, capacity, others):
+        # Hall's condition: cards confined to a group of seats must fit in it
+        for group in xrange(1, 1 << len(others)):
+            confined = sum(count for signature, count in signatures.iteritems()
+                           if count and not signature & ~group)
+            room = sum(capacity[other] for i, other in enumerate(others) if group >> i & 1)
+            if confined > room:
+                return False
+        return True
@@ -0,0 +1,98 @@
+"""
+Self-play tuning of bots.HeuristicBot parameters.
+
+A candidate is rated by its mean score advantage over default bots: every
+deal of a fixed list is played once per seat, the candidate taking that seat
+against default bots, so all candidates are compared on the same deals.
+Deals are spread over a process pool and a hill climber spends a fixed
+budget of evaluations.
+
+    python tuning.py [--deals N] [--budget N] [--processes N] [--seed N]
+"""
+import argparse
+import multiprocessing
+import random
+
+from bots import HeuristicBot, PARAMETERS, SPACE
+import simulate
+
+SEATS = 4
+
+
+def play_deal(args):
+    """mean score advantage of a candidate over its opponents on one deal"""
+    parameters, seed = args
+    advantage = 0.0
+    for seat in xrange(SEATS):
+        players = [HeuristicBot('Bot%d' % (i + 1)) for i in xrange(SEATS)]
+        players[seat] = HeuristicBot('Candidate', parameters)
+        scores = simulate.play_game(seed, players)['scores']
+        advantage += scores[seat] - (sum(scores) - scores[seat]) / (SEATS - 1.0)
+    return advantage / SEATS
+
+
+def neighbour(parameters, rng=random):
+    """`parameters` with one of them moved a step within SPACE"""
+    while True:
+        name = rng.choice(sorted(SPACE))
+        low, high = SPACE[name]
+        value = min(max(parameters[name] + rng.choice((-1, 1)), low), high)
+        if value != parameters[name]:
+            candidate = dict(parameters)
+            candidate[name] = value
+            return candidate
+
+
+def tune(deals=200, budget=30, processes=None, first_seed=0, seed=None, chunksize=8, progress=None):
+    """
+    Hill climbs from the default parameters, evaluating at most `budget`
+    distinct candidates on the deals first_seed .. first_seed + deals - 1.
+    Returns the best parameters, their advantage and every evaluation.
+    """
+    rng = random.Random(seed)
+    seeds = range(first_seed, first_seed + deals)
+    evaluations = {}
+    pool = multiprocessing.Pool(processes)
+    try:
+        def evaluate(parameters):
+            key = tuple(sorted(parameters.items()))
+            if key not in evaluations:
+                jobs = ((parameters, deal) for deal in seeds)
+                evaluations[key] = sum(pool.imap(play_deal, jobs, chunksize)) / len(seeds)
+                if progress:
+                    progress(parameters, evaluations[key])
+            return evaluations[key]
+
+        best = dict(PARAMETERS)
+        best_score = evaluate(best)
+        attempts = 0
+        while len(evaluations) < budget and attempts < budget * 10:
+            attempts += 1
+            candidate = neighbour(best, rng)
+            score = evaluate(candidate)
+            if score > best_score:
+                best, best_score = candidate, score
+    finally:
+        pool.close()
+        pool.join()
+    return best, best_score, evaluations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--deals', type=int, default=200, help='deals each candidate plays, once per seat')
+    parser.add_argument('--budget', type=int, default=30, help='candidates to evaluate')
+    parser.add_argument('--processes', type=int, help='worker processes, all cores by default')
+    parser.add_argument('--seed', type=int, help='seed of the search')
+    args = parser.parse_args()
+
+    def progress(parameters, score):
+        print '%+.3f %s' % (score, ' '.join('%s=%s' % item for item in sorted(parameters.items())))
+
+    best, score, evaluations = tune(args.deals, args.budget, args.processes, seed=args.seed,
+                                    progress=progress)
+    print 'best after %d evaluations: %+.3f %s' % (len(evaluations), score, best)
+
+
+if __name__ == '__main__':
+    main()
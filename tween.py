@@ -0,0 +1,63 @@
+"""
+Time based tweening: positions are computed from the time elapsed since the
+tween started, so an animation lasts its duration whatever the frame rate
+and a late frame skips ahead instead of slowing the animation down.
+"""
+import time
+
+_time_source = time.time
+
+
+def set_time_source(source):
+    """replaces time.time, e.g. by a simulated clock when rendering offline"""
+    global _time_source
+    _time_source = source
+
+
+def now():
+    return _time_source()
+
+
+def linear(t):
+    return t
+
+
+def ease_out_quad(t):
+    return t * (2 - t)
+
+
+def ease_in_out_quad(t):
+    if t < 0.5:
+        return 2 * t * t
+    return -1 + (4 - 2 * t) * t
+
+
+def _xy(position):
+    if hasattr(position, 'x'):
+        return position.x, position.y
+    return position
+
+
+class Tween:
+    def __init__(self, start, end, duration, easing=linear, started=None):
+        self.x1, self.y1 = _xy(start)
+        x2, y2 = _xy(end)
+        self.dx = x2 - self.x1
+        self.dy = y2 - self.y1
+        self.duration = duration
+        self.easing = easing
+        self.started = now() if started is None else started
+
+    def progress(self, at=None):
+        if at is None:
+            at = now()
+        if self.duration <= 0:
+            return 1.0
+        return min(1.0, max(0.0, (at - self.started) / float(self.duration)))
+
+    def position(self, at=None):
+        t = self.easing(self.progress(at))
+        return self.x1 + self.dx * t, self.y1 + self.dy * t
+
+    def done(self, at=None):
+        return self.progress(at) >= 1.0